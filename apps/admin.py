@@ -14,10 +14,10 @@ class CareerJourneyAdmin(admin.ModelAdmin):
     """
     Admin interface for the CareerJourney model.
     """
-    list_display = ('title', 'user', 'created_at', 'updated_at')
+    list_display = ('title', 'user', 'message_count', 'created_at', 'updated_at')
     list_filter = ('user',)
     search_fields = ('title', 'user__username')
-    readonly_fields = ('id', 'created_at', 'updated_at')
+    readonly_fields = ('id', 'created_at', 'updated_at', 'message_count', 'last_message_at', 'last_message_preview')
 
 @admin.register(ChatMessage)
 class ChatMessageAdmin(admin.ModelAdmin):
@@ -0,0 +1,230 @@
+# apps/admission.py
+#
+# Admission control for the expensive AI endpoints.
+#
+# @concurrency_limit caps how many requests an endpoint runs at once, both per user (so
+# double-clicking "find opportunities" doesn't start three pipelines) and in total (so
+# one endpoint can't take every worker during a spike). A user over their own limit is
+# turned away at once; a request over the endpoint limit waits in line briefly, and if
+# no slot frees up it gets a 429 with Retry-After and its place in the line.
+#
+# State lives in the default cache, so with Redis the limits hold across all workers.
+# Each slot is a lease that expires on its own, so a crashed worker can't leak one.
+
+import asyncio
+import functools
+import math
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.http import JsonResponse
+
+LEASE_SECONDS = 180        # a slot is reclaimed after this even if its request never finished
+QUEUE_WAIT_SECONDS = 5     # how long a request waits for an endpoint slot before getting a 429
+MAX_QUEUE = 20             # requests allowed to wait per endpoint; beyond this they're rejected at once
+POLL_SECONDS = 0.25
+LOCK_SECONDS = 2
+DEFAULT_DURATION = 10.0    # assumed request duration until an endpoint has been measured
+
+
+class _Gate:
+    """The slots and waiting line for one key (an endpoint, or a user on an endpoint)."""
+
+    def __init__(self, key, limit):
+        self.key = key
+        self.limit = limit
+        self._lock_key = f"{key}:lock"
+
+    def _locked(self, update):
+        # A short cache mutex: cache.add is atomic, and the lock expires if its holder dies
+        while not cache.add(self._lock_key, 1, LOCK_SECONDS):
+            time.sleep(0.005)
+        try:
+            state = cache.get(self.key) or {'active': {}, 'waiting': [], 'duration': DEFAULT_DURATION}
+            now = time.time()
+            state['active'] = {ticket: expires for ticket, expires in state['active'].items() if expires > now}
+            state['waiting'] = [(ticket, expires) for ticket, expires in state['waiting'] if expires > now]
+            result = update(state, now)
+            cache.set(self.key, state, LEASE_SECONDS)
+            return result
+        finally:
+            cache.delete(self._lock_key)
+
+    def try_enter(self, ticket, queue):
+        """
+        Takes a slot for `ticket` if one is free and nobody is ahead of it. Otherwise, with
+        queue=True, keeps it in line. Returns 0 once admitted, else its 1-based position
+        (None if the line is full).
+        """
+        def update(state, now):
+            waiting = [t for t, _ in state['waiting']]
+            ahead = waiting.index(ticket) if ticket in waiting else len(waiting)
+            if len(state['active']) < self.limit and ahead == 0:
+                state['active'][ticket] = now + LEASE_SECONDS
+                state['waiting'] = [(t, e) for t, e in state['waiting'] if t != ticket]
+                return 0
+            if not queue:
+                return ahead + 1
+            if ticket not in waiting:
+                if len(waiting) >= MAX_QUEUE:
+                    return None
+                state['waiting'].append((ticket, now + POLL_SECONDS * 8))
+            else:
+                # Still polling; keep the place in line alive
+                state['waiting'][ahead] = (ticket, now + POLL_SECONDS * 8)
+            return ahead + 1
+        return self._locked(update)
+
+    def leave(self, ticket, duration=None):
+        def update(state, now):
+            state['active'].pop(ticket, None)
+            state['waiting'] = [(t, e) for t, e in state['waiting'] if t != ticket]
+            if duration is not None:
+                state['duration'] = 0.8 * state['duration'] + 0.2 * duration
+            return state['duration']
+        return self._locked(update)
+
+    def retry_after(self, position):
+        state = cache.get(self.key) or {}
+        duration = state.get('duration', DEFAULT_DURATION)
+        return max(1, math.ceil(duration * max(1, position) / self.limit))
+
+
+class _Admission:
+    """One request's passage through the user gate and then the endpoint gate."""
+
+    def __init__(self, name, user_id, per_user, per_endpoint):
+        self.user_gate = _Gate(f"admission:{name}:user:{user_id}", per_user)
+        self.endpoint_gate = _Gate(f"admission:{name}", per_endpoint)
+        self.ticket = uuid.uuid4().hex
+        self.started = None
+
+    def enter_user(self):
+        return self.user_gate.try_enter(self.ticket, queue=False)
+
+    def enter_endpoint(self):
+        return self.endpoint_gate.try_enter(self.ticket, queue=True)
+
+    def abandon(self):
+        self.user_gate.leave(self.ticket)
+        self.endpoint_gate.leave(self.ticket)
+
+    def finish(self):
+        self.user_gate.leave(self.ticket)
+        self.endpoint_gate.leave(self.ticket, time.monotonic() - self.started)
+
+
+def _busy_response(message, position, retry_after):
+    response = JsonResponse({
+        'status': 'busy',
+        'message': message,
+        'queue_position': position,
+        'retry_after': retry_after,
+    }, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def _user_busy(admission):
+    return _busy_response(
+        "You already have this request running. Please wait for it to finish.",
+        1, admission.user_gate.retry_after(1))
+
+
+def _endpoint_busy(admission, position):
+    return _busy_response(
+        "This feature is very busy right now. Please try again shortly.",
+        position, admission.endpoint_gate.retry_after(position or MAX_QUEUE))
+
+
+def _release_when_done(response, admission):
+    """Releases the slots when the response is finished, which for a stream is when it ends."""
+    if not getattr(response, 'streaming', False):
+        admission.finish()
+        return response
+
+    content = response.streaming_content
+    if getattr(response, 'is_async', False):
+        async def released():
+            try:
+                async for chunk in content:
+                    yield chunk
+            finally:
+                await sync_to_async(admission.finish, thread_sensitive=False)()
+    else:
+        def released():
+            try:
+                yield from content
+            finally:
+                admission.finish()
+    response.streaming_content = released()
+    return response
+
+
+def concurrency_limit(name, per_user=1, per_endpoint=8, methods=('POST',)):
+    """
+    Limits a view to `per_user` concurrent requests per user and `per_endpoint` in total,
+    counting only requests with one of `methods`. Goes below @login_required. Works on
+    both sync and async views.
+    """
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method not in methods:
+                    return await view(request, *args, **kwargs)
+                user_id = await sync_to_async(lambda: request.user.pk)()
+                admission = _Admission(name, user_id, per_user, per_endpoint)
+                run = sync_to_async(thread_sensitive=False)
+                if await run(admission.enter_user)():
+                    return _user_busy(admission)
+                deadline = time.monotonic() + QUEUE_WAIT_SECONDS
+                while True:
+                    position = await run(admission.enter_endpoint)()
+                    if position == 0:
+                        break
+                    if position is None or time.monotonic() >= deadline:
+                        await run(admission.abandon)()
+                        return _endpoint_busy(admission, position)
+                    await asyncio.sleep(POLL_SECONDS)
+
+                admission.started = time.monotonic()
+                try:
+                    response = await view(request, *args, **kwargs)
+                except BaseException:
+                    await run(admission.finish)()
+                    raise
+                if getattr(response, 'streaming', False):
+                    return _release_when_done(response, admission)
+                await run(admission.finish)()
+                return response
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return view(request, *args, **kwargs)
+            admission = _Admission(name, request.user.pk, per_user, per_endpoint)
+            if admission.enter_user():
+                return _user_busy(admission)
+            deadline = time.monotonic() + QUEUE_WAIT_SECONDS
+            while True:
+                position = admission.enter_endpoint()
+                if position == 0:
+                    break
+                if position is None or time.monotonic() >= deadline:
+                    admission.abandon()
+                    return _endpoint_busy(admission, position)
+                time.sleep(POLL_SECONDS)
+
+            admission.started = time.monotonic()
+            try:
+                response = view(request, *args, **kwargs)
+            except BaseException:
+                admission.finish()
+                raise
+            return _release_when_done(response, admission)
+        return wrapper
+    return decorator
@@ -0,0 +1,63 @@
+# apps/async_views.py
+#
+# Helpers for the async views in views.py.
+#
+# Django 4.2's login_required, require_POST and csrf_exempt wrap a view in a plain
+# function, so an `async def` view behind them would be treated as sync and its
+# coroutine never awaited. These are the async equivalents.
+#
+# request.user is a lazy object that reads the session and the database the first time
+# it's touched, which isn't allowed on the event loop. async_login_required loads it in a
+# thread; after that it's cached on the request and safe to read from async code.
+
+import functools
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404, HttpResponseNotAllowed
+
+
+async def auser(request):
+    """request.user, loaded without blocking the event loop."""
+    await sync_to_async(lambda: request.user.is_authenticated)()
+    return request.user
+
+
+def async_login_required(view):
+    """login_required for async views: anonymous users are sent to the login page."""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await auser(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def async_require_POST(view):
+    """require_POST for async views."""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'POST':
+            return HttpResponseNotAllowed(['POST'])
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def async_csrf_exempt(view):
+    """csrf_exempt for async views."""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await view(request, *args, **kwargs)
+    wrapper.csrf_exempt = True
+    return wrapper
+
+
+async def aget_object_or_404(queryset, **lookup):
+    """get_object_or_404 using the async ORM. `queryset` may also be a model class."""
+    if not hasattr(queryset, 'aget'):
+        queryset = queryset._default_manager.all()
+    try:
+        return await queryset.aget(**lookup)
+    except queryset.model.DoesNotExist:
+        raise Http404(f"No {queryset.model._meta.object_name} matches the given query.")
@@ -0,0 +1,105 @@
+# apps/audio.py
+#
+# Energy-based voice activity detection on 16 kHz 16-bit mono PCM, used to trim what
+# is uploaded for speech-to-text. Leading and trailing silence is dropped (apart from
+# a little padding so word edges aren't clipped) and long pauses are shortened. It
+# works on the stream as ffmpeg produces it, so nothing is yielded until speech starts
+# and a clip with no speech yields nothing at all.
+
+from collections import deque
+
+import numpy as np
+
+from .transcoding import SAMPLE_RATE
+
+FRAME_MS = 30
+PADDING_MS = 200          # audio kept before speech starts and after it ends
+MAX_PAUSE_MS = 400        # pauses longer than this are shortened to it
+ONSET_FRAMES = 3          # consecutive voiced frames needed to count as speech (filters clicks)
+MIN_SPEECH_RMS = 300      # about -40 dBFS; quieter frames are never speech
+SPEECH_TO_NOISE = 3.0     # voiced frames must also be this many times louder than the noise floor
+
+
+class VoiceActivityTrimmer:
+
+    def __init__(self, sample_rate=SAMPLE_RATE):
+        self.frame_samples = sample_rate * FRAME_MS // 1000
+        self.frame_bytes = self.frame_samples * 2
+        padding_frames = PADDING_MS // FRAME_MS
+        pause_half = MAX_PAUSE_MS // FRAME_MS // 2
+
+        self.speech_found = False
+        self._in_speech = False
+        self._remainder = b''
+        self._noise_rms = None
+        self._loud_run = 0
+        self._preroll = deque(maxlen=padding_frames + ONSET_FRAMES)
+        # A pause keeps its first and last halves, so long silences collapse to MAX_PAUSE_MS
+        self._pause_half = pause_half
+        self._pause_head = []
+        self._pause_tail = deque(maxlen=pause_half)
+
+    def _voiced(self, rms):
+        threshold = MIN_SPEECH_RMS
+        if self._noise_rms is not None:
+            threshold = max(threshold, self._noise_rms * SPEECH_TO_NOISE)
+        voiced = rms >= threshold
+        if not voiced:
+            # Track the noise floor from unvoiced frames only; it falls immediately and rises slowly
+            self._noise_rms = rms if self._noise_rms is None else min(rms, self._noise_rms * 1.01)
+        return voiced
+
+    def process(self, pcm):
+        """Feeds PCM bytes in; returns the bytes to keep (possibly empty)."""
+        data = self._remainder + pcm
+        usable = len(data) - len(data) % self.frame_bytes
+        self._remainder = data[usable:]
+        if not usable:
+            return b''
+
+        samples = np.frombuffer(data[:usable], dtype='<i2').reshape(-1, self.frame_samples)
+        rms_values = np.sqrt(np.mean(samples.astype(np.float32) ** 2, axis=1))
+
+        kept = []
+        for index, rms in enumerate(rms_values):
+            frame = data[index * self.frame_bytes:(index + 1) * self.frame_bytes]
+            voiced = self._voiced(float(rms))
+            if not self._in_speech:
+                self._preroll.append(frame)
+                self._loud_run = self._loud_run + 1 if voiced else 0
+                if self._loud_run >= ONSET_FRAMES:
+                    kept.extend(self._preroll)
+                    self._preroll.clear()
+                    self._in_speech = self.speech_found = True
+            elif voiced:
+                kept.extend(self._pause_head)
+                kept.extend(self._pause_tail)
+                self._pause_head = []
+                self._pause_tail.clear()
+                kept.append(frame)
+            elif len(self._pause_head) < self._pause_half:
+                self._pause_head.append(frame)
+            else:
+                self._pause_tail.append(frame)
+        return b''.join(kept)
+
+    def finish(self):
+        """Returns the trailing padding after the last speech, once the input has ended."""
+        if not self._in_speech:
+            return b''
+        return b''.join(self._pause_head)
+
+
+def trim_silence(pcm_chunks, sample_rate=SAMPLE_RATE):
+    """
+    Wraps a stream of PCM chunks, yielding only speech (plus padding and shortened
+    pauses). Yields nothing for a clip that contains no speech.
+    """
+    trimmer = VoiceActivityTrimmer(sample_rate)
+    for chunk in pcm_chunks:
+        kept = trimmer.process(chunk)
+        if kept:
+            yield kept
+    tail = trimmer.finish()
+    if tail:
+        yield tail
@@ -4,12 +4,30 @@ import asyncio
 from datetime import datetime
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from django.conf import settings
-from openai import AzureOpenAI
-from .models import InterviewSession, InterviewTurn, UserProfile, InterviewResult, InterviewAnalysisPoint
+from asgiref.sync import sync_to_async
+from .llm import acomplete
+from .models import InterviewSession, InterviewTurn, UserProfile, InterviewResult
+from .presence import get_presence_summary, presence_score, record_frame
+from .quota import HIGH
+from .vision import FramePresenceAnalyzer
+from .speech import create_recognizer
+from .transcoding import SAMPLE_RATE
 
 logger = logging.getLogger(__name__)
 
+# Binary WebSocket messages start with a one-byte channel tag; the rest is the payload.
+CHANNEL_VIDEO_FRAME = 0x01  # JPEG camera frame for presence analysis
+CHANNEL_AUDIO = 0x02        # 16 kHz 16-bit mono PCM for streaming speech recognition
+
+MAX_FRAME_BYTES = 4 * 1024 * 1024
+FRAME_QUEUE_SIZE = 8         # per socket; frames arriving while it is full are dropped
+FRAME_DRAIN_TIMEOUT = 15     # seconds to finish queued frames before the final analysis
+MAX_UTTERANCE_BYTES = SAMPLE_RATE * 2 * 120  # two minutes of audio per answer
+
+# Caps concurrent vision calls across all interview sockets in this process
+_vision_slots = asyncio.Semaphore(4)
+
+
 class InterviewConsumer(AsyncWebsocketConsumer):
 
     async def connect(self):
@@ -35,6 +53,12 @@ class InterviewConsumer(AsyncWebsocketConsumer):
             await self.close()
             return
         
+        self.frame_queue = asyncio.Queue(maxsize=FRAME_QUEUE_SIZE)
+        self.frame_analyzer = FramePresenceAnalyzer()
+        self.recognizer = None
+        self.utterance_bytes = 0
+        self.frame_worker = asyncio.create_task(self.process_frames())
+
         await self.channel_layer.group_add(f'interview_{self.session_id}', self.channel_name)
         await self.accept()
         logger.info(f"[WebSocket] ✅ CONNECTION ACCEPTED for session {self.session_id}")
@@ -43,15 +67,119 @@ class InterviewConsumer(AsyncWebsocketConsumer):
 
     async def disconnect(self, close_code):
         logger.info(f"[WebSocket] Disconnected for session {self.session_id}. Triggering analysis.")
-        asyncio.create_task(self.analyze_and_save_results())
+        self.socket_closed = True
+        if getattr(self, 'recognizer', None) is not None:
+            recognizer, self.recognizer = self.recognizer, None
+            self.transcript_relay.cancel()
+            try:
+                await recognizer.close()
+            except Exception as e:
+                logger.warning(f"[STT] Error closing recognizer for session {self.session_id}: {e}")
+        asyncio.create_task(self.finish_interview())
         await self.channel_layer.group_discard(f'interview_{self.session_id}', self.channel_name)
 
-    async def receive(self, text_data):
+    async def receive(self, text_data=None, bytes_data=None):
+        if bytes_data:
+            await self.receive_binary(bytes_data)
+            return
+
         data = json.loads(text_data)
         if data.get('type') == 'user_speech':
             user_message = data.get('message', '')
             await self.create_interview_turn(user_message, 'user')
             await self.get_and_send_ai_response(user_message)
+        elif data.get('type') == 'audio_start':
+            await self.start_utterance()
+        elif data.get('type') == 'audio_end':
+            await self.end_utterance()
+
+    async def receive_binary(self, bytes_data):
+        channel, payload = bytes_data[0], bytes_data[1:]
+        if channel == CHANNEL_VIDEO_FRAME:
+            if len(payload) > MAX_FRAME_BYTES:
+                logger.warning(f"[Frames] Dropped oversized frame ({len(payload)} bytes) for session {self.session_id}")
+                return
+            try:
+                self.frame_queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                # Presence is sampled, so losing a frame under load only costs one data point
+                logger.warning(f"[Frames] Queue full, dropped frame for session {self.session_id}")
+        elif channel == CHANNEL_AUDIO:
+            if self.recognizer is None:
+                return
+            self.utterance_bytes += len(payload)
+            if self.utterance_bytes > MAX_UTTERANCE_BYTES:
+                logger.warning(f"[STT] Utterance too long for session {self.session_id}; ending it")
+                await self.end_utterance()
+                return
+            await self.recognizer.push(payload)
+        else:
+            logger.warning(f"[WebSocket] Unknown binary channel {channel:#04x} for session {self.session_id}")
+
+    async def start_utterance(self):
+        if self.recognizer is not None:
+            return
+        try:
+            self.recognizer = create_recognizer()
+            await self.recognizer.start()
+        except Exception as e:
+            logger.error(f"[STT] Could not start recognition for session {self.session_id}: {e}", exc_info=True)
+            self.recognizer = None
+            await self.send(text_data=json.dumps({'type': 'final_transcript', 'text': '', 'error': True}))
+            return
+        self.utterance_bytes = 0
+        self.transcript_relay = asyncio.create_task(self.relay_partial_transcripts(self.recognizer))
+
+    async def relay_partial_transcripts(self, recognizer):
+        while True:
+            kind, text = await recognizer.events.get()
+            await self.send(text_data=json.dumps({'type': f'{kind}_transcript', 'text': text}))
+
+    async def end_utterance(self):
+        """Closes the audio stream; the final transcript is sent back and answered by the AI straight away."""
+        recognizer, self.recognizer = self.recognizer, None
+        if recognizer is None:
+            return
+        try:
+            user_message = (await recognizer.finish()).strip()
+        except Exception as e:
+            logger.error(f"[STT] Recognition failed for session {self.session_id}: {e}", exc_info=True)
+            user_message = ''
+        finally:
+            self.transcript_relay.cancel()
+
+        await self.send(text_data=json.dumps({'type': 'final_transcript', 'text': user_message}))
+        if user_message:
+            await self.create_interview_turn(user_message, 'user')
+            await self.get_and_send_ai_response(user_message)
+
+    async def process_frames(self):
+        """Analyzes queued frames one at a time per socket, sharing the process-wide vision slots."""
+        while True:
+            frame = await self.frame_queue.get()
+            try:
+                async with _vision_slots:
+                    # Not thread-sensitive, so vision calls don't queue behind the ORM thread
+                    person_detected = await sync_to_async(self.frame_analyzer.analyze, thread_sensitive=False)(frame)
+                await self.record_presence(person_detected)
+                if not getattr(self, 'socket_closed', False):
+                    await self.send(text_data=json.dumps({'type': 'frame_analyzed', 'person_detected': person_detected}))
+            except Exception as e:
+                logger.error(f"[Frames] Analysis failed for session {self.session_id}: {e}", exc_info=True)
+            finally:
+                self.frame_queue.task_done()
+
+    async def finish_interview(self):
+        frame_worker = getattr(self, 'frame_worker', None)
+        if frame_worker is None:
+            # The connection was rejected before the interview started
+            return
+        try:
+            await asyncio.wait_for(self.frame_queue.join(), FRAME_DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"[Frames] Gave up waiting on {self.frame_queue.qsize()} queued frames for session {self.session_id}")
+        frame_worker.cancel()
+        await self.analyze_and_save_results()
 
     async def get_and_send_ai_response(self, user_message):
         try:
@@ -69,20 +197,15 @@ class InterviewConsumer(AsyncWebsocketConsumer):
                 f"Ask one question at a time. {personality_context}"
             )
             
-            client = AzureOpenAI(
-                azure_endpoint=settings.AZURE_OPENAI_AGENT_ENDPOINT,
-                api_key=settings.AZURE_OPENAI_AGENT_KEY,
-                api_version="2024-02-01"
-            )
-            
             conversation_history = [{"role": "system", "content": system_prompt}]
             turns = await self.get_interview_turns()
             for turn in turns:
                 role = "user" if turn.speaker == 'user' else "assistant"
                 conversation_history.append({"role": role, "content": turn.text})
 
-            response = client.chat.completions.create(
-                model=settings.AZURE_OPENAI_AGENT_DEPLOYMENT_NAME,
+            # Live turns outrank everything else for the model quota
+            response = await acomplete(
+                priority=HIGH,
                 messages=conversation_history,
                 temperature=0.8,
                 max_tokens=200,
@@ -112,16 +235,13 @@ class InterviewConsumer(AsyncWebsocketConsumer):
                 return
 
             transcript = "\n".join([f"{turn.speaker.upper()}: {turn.text}" for turn in turns])
-            analysis_points = await self.get_analysis_points()
+            presence = await self.get_presence_summary()
             
             presence_summary = "Camera analysis was not enabled for this session."
             camera_presence_score = 0
             
-            if analysis_points:
-                total_points = len(analysis_points)
-                presence_count = sum(1 for point in analysis_points if point.person_detected)
-                presence_percentage = (presence_count / total_points) * 100 if total_points > 0 else 0
-                camera_presence_score = int(presence_percentage)
+            if presence:
+                camera_presence_score = presence_score(presence)
                 presence_summary = f"Camera Presence Analysis: The user was visibly present on camera for approximately {camera_presence_score}% of the interview."
 
             system_prompt = (
@@ -147,14 +267,7 @@ class InterviewConsumer(AsyncWebsocketConsumer):
             
             user_prompt = f"Analyze this transcript:\n\n{transcript}"
 
-            client = AzureOpenAI(
-                azure_endpoint=settings.AZURE_OPENAI_AGENT_ENDPOINT,
-                api_key=settings.AZURE_OPENAI_AGENT_KEY,
-                api_version="2024-02-01"
-            )
-            
-            response = client.chat.completions.create(
-                model=settings.AZURE_OPENAI_AGENT_DEPLOYMENT_NAME,
+            response = await acomplete(
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
@@ -205,8 +318,12 @@ class InterviewConsumer(AsyncWebsocketConsumer):
         return list(InterviewTurn.objects.filter(session_id=self.session_id).order_by('timestamp'))
 
     @database_sync_to_async
-    def get_analysis_points(self):
-        return list(InterviewAnalysisPoint.objects.filter(session_id=self.session_id).order_by('timestamp'))
+    def record_presence(self, person_detected):
+        record_frame(self.session_id, person_detected)
+
+    @database_sync_to_async
+    def get_presence_summary(self):
+        return get_presence_summary(self.session_id)
 
     @database_sync_to_async
     def create_interview_result(self, analysis_data, camera_presence_score):
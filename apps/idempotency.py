@@ -0,0 +1,219 @@
+# apps/idempotency.py
+#
+# Idempotency keys for the costly POST endpoints.
+#
+# A client sends an `Idempotency-Key` header with a value it reuses when it retries or
+# re-submits the same action. The first request with a key runs the view; its response
+# is stored per (endpoint, user, key). A duplicate that arrives while the original is
+# still running waits for it, and a duplicate that arrives afterwards gets the stored
+# response replayed (marked with `Idempotent-Replayed: true`). Either way the model call,
+# the scraper run and any writes happen once.
+#
+# A key reused with a different request body is rejected with 422. Responses that are
+# worth retrying (5xx and 429) aren't stored, so a retry with the same key runs again.
+# Requests without the header are not affected.
+
+import asyncio
+import functools
+import hashlib
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+
+PENDING_SECONDS = 5 * 60           # a running request's claim expires after this (if its worker died)
+RESULT_SECONDS = 24 * 60 * 60      # completed responses are replayed for this long
+ATTACH_WAIT_SECONDS = 60           # how long a duplicate waits for the original to finish
+POLL_SECONDS = 0.25
+MAX_KEY_LENGTH = 255
+REPLAYED_HEADERS = ('Content-Type', 'Retry-After', 'Cache-Control')
+
+
+def _is_replayable(status_code):
+    return status_code < 500 and status_code != 429
+
+
+class _Execution:
+    """The stored state for one (endpoint, user, key)."""
+
+    def __init__(self, name, user_id, key, body):
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        self.cache_key = f"idempotency:{name}:{user_id}:{digest}"
+        self.fingerprint = hashlib.sha256(body).hexdigest()
+
+    def claim(self):
+        """Returns None if this request now owns the key, else the existing record."""
+        if cache.add(self.cache_key, {'state': 'pending', 'fingerprint': self.fingerprint}, PENDING_SECONDS):
+            return None
+        return cache.get(self.cache_key) or {'state': 'pending', 'fingerprint': self.fingerprint}
+
+    def lookup(self):
+        return cache.get(self.cache_key)
+
+    def store(self, status_code, content, headers):
+        if not _is_replayable(status_code):
+            cache.delete(self.cache_key)
+            return
+        cache.set(self.cache_key, {
+            'state': 'done',
+            'fingerprint': self.fingerprint,
+            'status': status_code,
+            'content': content,
+            'headers': headers,
+        }, RESULT_SECONDS)
+
+    def release(self):
+        cache.delete(self.cache_key)
+
+
+def _replay(record):
+    response = HttpResponse(record['content'], status=record['status'])
+    for header, value in record['headers'].items():
+        response[header] = value
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _mismatch():
+    return JsonResponse({
+        'status': 'error',
+        'message': 'This Idempotency-Key was already used for a different request.',
+    }, status=422)
+
+
+def _still_running():
+    response = JsonResponse({
+        'status': 'busy',
+        'message': 'The original request with this Idempotency-Key is still running.',
+    }, status=409)
+    response['Retry-After'] = '5'
+    return response
+
+
+def _settle(record, execution):
+    """The response for a duplicate, given the current record (None: the original failed)."""
+    if record is None:
+        return None
+    if record['fingerprint'] != execution.fingerprint:
+        return _mismatch()
+    if record['state'] == 'done':
+        return _replay(record)
+    return _still_running()
+
+
+def _kept_headers(response):
+    return {header: response[header] for header in REPLAYED_HEADERS if response.has_header(header)}
+
+
+def _store_when_done(response, execution):
+    """Stores the response; a stream is captured as it is sent and stored once it ends."""
+    if not getattr(response, 'streaming', False):
+        execution.store(response.status_code, response.content, _kept_headers(response))
+        return response
+
+    content = response.streaming_content
+    status_code, headers = response.status_code, _kept_headers(response)
+    if getattr(response, 'is_async', False):
+        async def captured():
+            chunks = []
+            completed = False
+            try:
+                async for chunk in content:
+                    chunks.append(chunk)
+                    yield chunk
+                completed = True
+            finally:
+                if completed:
+                    await sync_to_async(execution.store)(status_code, b''.join(chunks), headers)
+                else:
+                    await sync_to_async(execution.release)()
+    else:
+        def captured():
+            chunks = []
+            completed = False
+            try:
+                for chunk in content:
+                    chunks.append(chunk)
+                    yield chunk
+                completed = True
+            finally:
+                if completed:
+                    execution.store(status_code, b''.join(chunks), headers)
+                else:
+                    execution.release()
+    response.streaming_content = captured()
+    return response
+
+
+def idempotent(name):
+    """
+    Honours the Idempotency-Key header on a view (see module docs). Goes below
+    @login_required, and above @concurrency_limit so duplicates don't take a slot.
+    """
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                key = request.headers.get('Idempotency-Key', '')
+                if request.method != 'POST' or not key or len(key) > MAX_KEY_LENGTH:
+                    return await view(request, *args, **kwargs)
+                user_id = await sync_to_async(lambda: request.user.pk)()
+                execution = _Execution(name, user_id, key, request.body)
+
+                record = await sync_to_async(execution.claim)()
+                if record is not None:
+                    deadline = time.monotonic() + ATTACH_WAIT_SECONDS
+                    while record is not None and record['state'] == 'pending' and time.monotonic() < deadline:
+                        if record['fingerprint'] != execution.fingerprint:
+                            break
+                        await asyncio.sleep(POLL_SECONDS)
+                        record = await sync_to_async(execution.lookup)()
+                    settled = _settle(record, execution)
+                    if settled is not None:
+                        return settled
+                    # The original failed without a stored result; this request takes over
+                    if await sync_to_async(execution.claim)() is not None:
+                        return _still_running()
+
+                try:
+                    response = await view(request, *args, **kwargs)
+                except BaseException:
+                    await sync_to_async(execution.release)()
+                    raise
+                if getattr(response, 'streaming', False):
+                    return _store_when_done(response, execution)
+                await sync_to_async(execution.store)(response.status_code, response.content, _kept_headers(response))
+                return response
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key = request.headers.get('Idempotency-Key', '')
+            if request.method != 'POST' or not key or len(key) > MAX_KEY_LENGTH:
+                return view(request, *args, **kwargs)
+            execution = _Execution(name, request.user.pk, key, request.body)
+
+            record = execution.claim()
+            if record is not None:
+                deadline = time.monotonic() + ATTACH_WAIT_SECONDS
+                while record is not None and record['state'] == 'pending' and time.monotonic() < deadline:
+                    if record['fingerprint'] != execution.fingerprint:
+                        break
+                    time.sleep(POLL_SECONDS)
+                    record = execution.lookup()
+                settled = _settle(record, execution)
+                if settled is not None:
+                    return settled
+                # The original failed without a stored result; this request takes over
+                if execution.claim() is not None:
+                    return _still_running()
+
+            try:
+                response = view(request, *args, **kwargs)
+            except BaseException:
+                execution.release()
+                raise
+            return _store_when_done(response, execution)
+        return wrapper
+    return decorator
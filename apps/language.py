@@ -0,0 +1,26 @@
+# apps/language.py
+
+import threading
+
+from azure.ai.textanalytics import TextAnalyticsClient
+from azure.core.credentials import AzureKeyCredential
+from django.conf import settings
+
+from .outbound import azure_transport
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_language_client():
+    """The process-wide TextAnalyticsClient, on the shared outbound session."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = TextAnalyticsClient(
+                    endpoint=settings.AZURE_LANGUAGE_ENDPOINT,
+                    credential=AzureKeyCredential(settings.AZURE_LANGUAGE_KEY),
+                    transport=azure_transport(),
+                )
+    return _client
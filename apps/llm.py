@@ -0,0 +1,345 @@
+# apps/llm.py
+#
+# Chat completions against a pool of Azure OpenAI deployments.
+#
+# Every completion goes through complete() / acomplete(), which:
+#   - route each call to the deployment with the lowest expected latency (an EWMA of
+#     its recent latencies, scaled by the calls it already has in flight); deployments
+#     with no measurements yet are tried first, so new ones get sampled
+#   - skip deployments whose circuit breaker is open, and fail over to another
+#     deployment once if the chosen one fails
+#   - with settings.LLM_HEDGING, send a duplicate request to a second deployment once
+#     the first has run past its own p95 latency, keep whichever answers first, and
+#     cancel the other
+#   - take the call's estimated tokens from the deployment's tokens-per-minute bucket
+#     first (see quota.py), waiting for quota by priority instead of collecting 429s
+#
+# Clients are shared, so their keep-alive connections are reused: one sync client per
+# deployment for the process, and one async client per deployment per event loop, since
+# httpx async pools can't move between loops. They come from outbound.py, and each call
+# holds one of its per-host slots, so LLM calls count against the same limit as every
+# other call to that host. Each deployment's own breaker stands in for the host breaker.
+
+import asyncio
+import logging
+import random
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import wait as wait_futures
+from contextlib import contextmanager
+
+import httpx
+from django.conf import settings
+from openai import AsyncAzureOpenAI, AzureOpenAI
+
+from . import outbound
+from .quota import NORMAL, create_bucket
+from .resilience import OPEN_SECONDS, CircuitOpen, counts_as_failure, get_breaker
+
+logger = logging.getLogger(__name__)
+
+API_VERSION = "2024-02-01"
+LLM_TIMEOUT = httpx.Timeout(60, connect=3.05)
+
+EWMA_ALPHA = 0.2              # weight of the newest latency in a deployment's average
+FAILURE_LATENCY = 10.0        # a failed call counts as at least this slow (seconds)
+LATENCY_SAMPLES = 200         # recent successful latencies kept per deployment, for the p95
+MIN_HEDGE_SAMPLES = 20        # below this, HEDGE_DEFAULT_DELAY is used instead of the p95
+HEDGE_DEFAULT_DELAY = 3.0
+MIN_HEDGE_DELAY = 0.05
+HEDGE_WORKERS = 16            # threads for sync hedged calls
+
+CHARS_PER_TOKEN = 4           # rough English average, for estimating prompt tokens
+DEFAULT_COMPLETION_TOKENS = 1000  # assumed completion size for calls without max_tokens
+
+
+def estimate_tokens(kwargs):
+    """Tokens a completion may use: the prompt estimated from its length, plus max_tokens."""
+    messages = kwargs.get('messages', [])
+    prompt = sum(len(m.get('content') or '') for m in messages) // CHARS_PER_TOKEN + 4 * len(messages)
+    return prompt + (kwargs.get('max_tokens') or DEFAULT_COMPLETION_TOKENS)
+
+
+def _used_tokens(response, estimate):
+    usage = getattr(response, 'usage', None)
+    return usage.total_tokens if usage is not None else estimate
+
+
+class Deployment:
+    """One Azure OpenAI deployment and what we've measured about it."""
+
+    def __init__(self, name, endpoint, key, deployment, max_retries=2, tpm=None):
+        self.name = name
+        self.endpoint = endpoint
+        self.key = key
+        self.deployment = deployment
+        self.max_retries = max_retries
+        self.breaker = get_breaker(f"azure-openai:{name}")
+        # No tokens-per-minute figure means no client-side limit
+        self.bucket = create_bucket(name, tpm) if tpm else None
+        self.ewma = None
+        self.inflight = 0
+        self.calls = 0
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._lock = threading.Lock()
+        self._client = None
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    def _client_options(self):
+        return dict(
+            azure_endpoint=self.endpoint,
+            api_key=self.key,
+            api_version=API_VERSION,
+            timeout=LLM_TIMEOUT,
+            max_retries=self.max_retries,
+        )
+
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = AzureOpenAI(
+                    http_client=outbound.httpx_client(LLM_TIMEOUT),
+                    **self._client_options(),
+                )
+            return self._client
+
+    def async_client(self):
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = AsyncAzureOpenAI(
+                http_client=outbound.async_httpx_client(LLM_TIMEOUT),
+                **self._client_options(),
+            )
+            self._async_clients[loop] = client
+        return client
+
+    def expected_latency(self):
+        if self.ewma is None:
+            return 0.0
+        return self.ewma * (1 + self.inflight)
+
+    def hedge_delay(self):
+        """This deployment's p95 latency: how long to wait before hedging a call to it."""
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < MIN_HEDGE_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        return max(MIN_HEDGE_DELAY, samples[int(len(samples) * 0.95) - 1])
+
+    def _observe(self, latency, sample=True):
+        with self._lock:
+            self.ewma = latency if self.ewma is None else EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * self.ewma
+            if sample:
+                self._latencies.append(latency)
+
+    @contextmanager
+    def measure(self):
+        with self._lock:
+            self.inflight += 1
+            self.calls += 1
+        started = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            if counts_as_failure(e):
+                self._observe(max(time.monotonic() - started, FAILURE_LATENCY), sample=False)
+            raise
+        except BaseException:
+            # Cancelled (it lost a hedge): it took at least this long, which still says something
+            self._observe(time.monotonic() - started, sample=False)
+            raise
+        else:
+            self._observe(time.monotonic() - started)
+        finally:
+            with self._lock:
+                self.inflight -= 1
+
+
+class DeploymentPool:
+
+    def __init__(self, deployments, hedging=False):
+        self.deployments = deployments
+        self.hedging = hedging and len(deployments) > 1
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def choose(self, exclude=()):
+        """The available deployment with the lowest expected latency, or None."""
+        candidates = [d for d in self.deployments if d not in exclude and d.breaker.available()]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda d: (d.expected_latency(), random.random()))
+
+    def _first_choice(self):
+        deployment = self.choose()
+        if deployment is None:
+            raise CircuitOpen('azure-openai', OPEN_SECONDS)
+        return deployment
+
+    # --- sync -----------------------------------------------------------------
+
+    def call(self, deployment, kwargs, priority=NORMAL):
+        bucket = deployment.bucket
+        estimate = estimate_tokens(kwargs)
+        taken = bucket.acquire(estimate, priority) if bucket else 0
+        try:
+            # The host slot is taken outside the breaker: waiting on our own limit isn't the deployment failing
+            with outbound.host_slot(deployment.endpoint), deployment.breaker.guard(), deployment.measure():
+                response = deployment.client().chat.completions.create(model=deployment.deployment, **kwargs)
+        except Exception:
+            if bucket:
+                bucket.settle(taken, 0)
+            raise
+        if bucket:
+            bucket.settle(taken, _used_tokens(response, taken))
+        return response
+
+    def complete(self, priority=NORMAL, **kwargs):
+        primary = self._first_choice()
+        if self.hedging and not kwargs.get('stream'):
+            return self._hedged(primary, kwargs, priority)
+        try:
+            return self.call(primary, kwargs, priority)
+        except Exception as e:
+            backup = self.choose(exclude=(primary,)) if counts_as_failure(e) else None
+            if backup is None:
+                raise
+            logger.warning(f"[LLM] {primary.name} failed ({e}); failing over to {backup.name}.")
+            return self.call(backup, kwargs, priority)
+
+    def _hedge_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix='llm-hedge')
+            return self._executor
+
+    def _hedged(self, primary, kwargs, priority):
+        executor = self._hedge_executor()
+        started = threading.Event()
+
+        def call_primary():
+            started.set()
+            return self.call(primary, kwargs, priority)
+
+        futures = [executor.submit(call_primary)]
+        # The hedge delay counts from when the primary call starts, not from when it was
+        # queued; otherwise every call queued behind busy workers would be hedged
+        started.wait()
+        done, _ = wait_futures(futures, timeout=primary.hedge_delay())
+        if not done or futures[0].exception() is not None:
+            backup = self.choose(exclude=(primary,))
+            if backup is not None:
+                logger.info(f"[LLM] Hedging a slow or failed call on {primary.name} with {backup.name}.")
+                futures.append(executor.submit(self.call, backup, kwargs, priority))
+
+        error = None
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                error = e
+                continue
+            # A blocking HTTP call can't be interrupted; the loser finishes in the background and is dropped
+            for other in futures:
+                other.cancel()
+            return result
+        raise error
+
+    # --- async ----------------------------------------------------------------
+
+    async def acall(self, deployment, kwargs, priority=NORMAL):
+        bucket = deployment.bucket
+        estimate = estimate_tokens(kwargs)
+        taken = await bucket.aacquire(estimate, priority) if bucket else 0
+        try:
+            async with outbound.async_host_slot(deployment.endpoint):
+                with deployment.breaker.guard(), deployment.measure():
+                    response = await deployment.async_client().chat.completions.create(
+                        model=deployment.deployment, **kwargs)
+        except Exception:
+            if bucket:
+                await bucket.asettle(taken, 0)
+            raise
+        if bucket:
+            await bucket.asettle(taken, _used_tokens(response, taken))
+        return response
+
+    async def acomplete(self, priority=NORMAL, **kwargs):
+        primary = self._first_choice()
+        if self.hedging and not kwargs.get('stream'):
+            return await self._ahedged(primary, kwargs, priority)
+        try:
+            return await self.acall(primary, kwargs, priority)
+        except Exception as e:
+            backup = self.choose(exclude=(primary,)) if counts_as_failure(e) else None
+            if backup is None:
+                raise
+            logger.warning(f"[LLM] {primary.name} failed ({e}); failing over to {backup.name}.")
+            return await self.acall(backup, kwargs, priority)
+
+    async def _ahedged(self, primary, kwargs, priority):
+        tasks = [asyncio.ensure_future(self.acall(primary, kwargs, priority))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=primary.hedge_delay())
+            if not done or tasks[0].exception() is not None:
+                backup = self.choose(exclude=(primary,))
+                if backup is not None:
+                    logger.info(f"[LLM] Hedging a slow or failed call on {primary.name} with {backup.name}.")
+                    tasks.append(asyncio.ensure_future(self.acall(backup, kwargs, priority)))
+
+            error = None
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    return await next_done
+                except Exception as e:
+                    error = e
+            raise error
+        finally:
+            # Cancelling the loser closes its connection, so Azure stops generating for it
+            for task in tasks:
+                task.cancel()
+
+
+def deployments_from_settings():
+    configs = [{
+        'name': 'agent',
+        'endpoint': settings.AZURE_OPENAI_AGENT_ENDPOINT,
+        'key': settings.AZURE_OPENAI_AGENT_KEY,
+        'deployment': settings.AZURE_OPENAI_AGENT_DEPLOYMENT_NAME,
+        'tpm': settings.AZURE_OPENAI_AGENT_TPM,
+    }] + list(settings.AZURE_OPENAI_EXTRA_DEPLOYMENTS)
+    # With somewhere else to go, fail over right away instead of retrying the same deployment
+    max_retries = 2 if len(configs) == 1 else 0
+    return [Deployment(max_retries=max_retries, **config) for config in configs]
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """The process-wide DeploymentPool, built from settings on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = DeploymentPool(deployments_from_settings(), hedging=settings.LLM_HEDGING)
+    return _pool
+
+
+def complete(priority=NORMAL, **kwargs):
+    """
+    chat.completions.create() on the best available deployment; `model` is set per deployment.
+    `priority` (HIGH, NORMAL or LOW) decides who gets the token quota when it runs short.
+    Raises quota.QuotaExceeded if the tokens can't be had within the priority's wait.
+    """
+    return get_pool().complete(priority, **kwargs)
+
+
+async def acomplete(priority=NORMAL, **kwargs):
+    """Async complete(). With stream=True there's no hedging, and only opening the stream is measured."""
+    return await get_pool().acomplete(priority, **kwargs)
@@ -0,0 +1,129 @@
+# apps/management/commands/benchmark_llm_routing.py
+
+import asyncio
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+from apps.llm import Deployment, DeploymentPool
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers Azure OpenAI chat completion requests after a simulated model latency."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.server.latency())
+        body = json.dumps({
+            'id': 'chatcmpl-stub', 'object': 'chat.completion', 'created': int(time.time()), 'model': 'stub',
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': 'ok'}}],
+        }).encode()
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client cancelled this request (it lost a hedge)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, median, tail_rate, tail_factor, seed):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.median = median
+        self.tail_rate = tail_rate
+        self.tail_factor = tail_factor
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def latency(self):
+        with self._lock:
+            latency = self._random.lognormvariate(0, 0.25) * self.median
+            if self._random.random() < self.tail_rate:
+                latency *= self.tail_factor
+        return latency
+
+    def handle_error(self, request, client_address):
+        pass
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = ('Starts local Azure OpenAI stub deployments with long-tailed latency and compares p50/p95/p99 '
+            'completion latency for a single deployment, latency-aware routing, and routing with hedging.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--deployments', type=int, default=3, help='Number of stub deployments.')
+        parser.add_argument('--requests', type=int, default=400, help='Completions per scenario.')
+        parser.add_argument('--concurrency', type=int, default=8, help='Completions in flight at once.')
+        parser.add_argument('--median-ms', type=float, default=150, help='Median stub latency.')
+        parser.add_argument('--tail-rate', type=float, default=0.05, help='Share of calls that hit the slow tail.')
+        parser.add_argument('--tail-factor', type=float, default=8, help='How much slower a tail call is.')
+        parser.add_argument('--seed', type=int, default=7)
+
+    def handle(self, *args, **options):
+        stubs = []
+        for index in range(options['deployments']):
+            # The first stub is the degraded one, twice as slow as the others
+            median = options['median_ms'] / 1000 * (2 if index == 0 else 1)
+            stub = StubServer(median, options['tail_rate'], options['tail_factor'], options['seed'] + index)
+            threading.Thread(target=stub.serve_forever, daemon=True).start()
+            stubs.append(stub)
+        self.stdout.write(f"Started {len(stubs)} stub deployments (stub-0 degraded).")
+
+        scenarios = [
+            ('single deployment', stubs[:1], False),
+            ('latency-aware routing', stubs, False),
+            ('routing + hedging', stubs, True),
+        ]
+        try:
+            for label, scenario_stubs, hedging in scenarios:
+                self._run(label, scenario_stubs, hedging, options)
+        finally:
+            for stub in stubs:
+                stub.shutdown()
+
+    def _run(self, label, stubs, hedging, options):
+        deployments = [
+            Deployment(f"stub-{index}", f"http://127.0.0.1:{stub.server_address[1]}", 'stub-key', 'stub',
+                       max_retries=0)
+            for index, stub in enumerate(stubs)
+        ]
+        pool = DeploymentPool(deployments, hedging=hedging)
+        latencies = asyncio.run(self._drive(pool, options['requests'], options['concurrency']))
+        latencies.sort()
+        shares = ', '.join(f"{d.name} {d.calls}" for d in deployments)
+        self.stdout.write(self.style.SUCCESS(
+            f"{label:>24}: p50 {percentile(latencies, 0.50) * 1000:6.0f} ms | "
+            f"p95 {percentile(latencies, 0.95) * 1000:6.0f} ms | "
+            f"p99 {percentile(latencies, 0.99) * 1000:6.0f} ms | calls: {shares}"
+        ))
+
+    async def _drive(self, pool, total, concurrency):
+        slots = asyncio.Semaphore(concurrency)
+        latencies = []
+
+        async def one():
+            async with slots:
+                started = time.perf_counter()
+                await pool.acomplete(messages=[{'role': 'user', 'content': 'ping'}], max_tokens=5)
+                latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(one() for _ in range(total)))
+        return latencies
@@ -0,0 +1,59 @@
+# apps/management/commands/benchmark_person_detectors.py
+
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.vision import PERSON_DETECTORS, get_person_detector, prepare_frame
+
+IMAGE_SUFFIXES = {'.jpg', '.jpeg', '.png'}
+
+
+class Command(BaseCommand):
+    help = ('Runs each camera presence detector over a folder of sample frames and reports '
+            'throughput and agreement with the reference detector.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('frames_dir', help='Folder of sample camera frames (JPEG or PNG).')
+        parser.add_argument('--detectors', nargs='+', default=list(PERSON_DETECTORS),
+                            choices=list(PERSON_DETECTORS), help='Detectors to compare.')
+        parser.add_argument('--reference', default='azure', choices=list(PERSON_DETECTORS),
+                            help='Detector whose verdicts count as ground truth for agreement.')
+
+    def handle(self, *args, **options):
+        paths = sorted(p for p in Path(options['frames_dir']).iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+        if not paths:
+            raise CommandError(f"No JPEG or PNG frames found in {options['frames_dir']}.")
+
+        frames = [prepare_frame(path.read_bytes()) for path in paths]
+        self.stdout.write(f"Loaded {len(frames)} frames from {options['frames_dir']}.")
+
+        detectors = list(dict.fromkeys([options['reference']] + options['detectors']))
+        verdicts = {}
+        for name in detectors:
+            detector = get_person_detector(name)
+            started = time.perf_counter()
+            try:
+                verdicts[name] = [detector.detect(frame) for frame in frames]
+            except Exception as e:
+                self.stderr.write(f"  - {name}: failed ({e})")
+                continue
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"  - {name}: {elapsed / len(frames) * 1000:.1f} ms/frame, {len(frames) / elapsed:.1f} frames/s, "
+                f"{sum(verdicts[name])}/{len(frames)} with a person"
+            )
+
+        reference = verdicts.get(options['reference'])
+        if reference is None:
+            self.stderr.write("Reference detector failed; agreement not computed.")
+            return
+        for name, results in verdicts.items():
+            if name == options['reference']:
+                continue
+            agreed = sum(a == b for a, b in zip(results, reference))
+            self.stdout.write(self.style.SUCCESS(
+                f"{name} agrees with {options['reference']} on {agreed}/{len(frames)} frames "
+                f"({agreed / len(frames) * 100:.1f}%)."
+            ))
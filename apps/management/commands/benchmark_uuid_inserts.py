@@ -0,0 +1,90 @@
+# apps/management/commands/benchmark_uuid_inserts.py
+
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from apps.fields import uuid7
+
+# Scratch tables shaped like InterviewAnalysisPoint: a UUID key, a session foreign key and a timestamp
+VARIANTS = [
+    # (label, table, mysql key type, other-db key type, key generator, key to db value)
+    ('uuid4 char(32)', 'bench_uuid4_char', 'CHAR(32)', 'CHAR(32)', uuid.uuid4, lambda key: key.hex),
+    ('uuid7 binary(16)', 'bench_uuid7_binary', 'BINARY(16)', 'BLOB', uuid7, lambda key: key.bytes),
+]
+
+
+class Command(BaseCommand):
+    help = ('Compares bulk-insert throughput and index size for random char(32) UUID keys '
+            'against time-ordered binary(16) UUID keys, using scratch tables.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200_000, help='Rows to insert per variant.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per INSERT batch.')
+
+    def handle(self, *args, **options):
+        rows, batch_size = options['rows'], options['batch_size']
+        is_mysql = connection.vendor == 'mysql'
+        self.stdout.write(f"Inserting {rows} rows per variant in batches of {batch_size} ({connection.vendor})...")
+
+        for label, table, mysql_type, other_type, new_key, to_db in VARIANTS:
+            key_type = mysql_type if is_mysql else other_type
+            session_id = to_db(new_key())
+            try:
+                self._create_table(table, key_type, is_mysql)
+                elapsed = self._insert_rows(table, rows, batch_size, new_key, to_db, session_id)
+                size = self._table_size(table, is_mysql)
+            finally:
+                with connection.cursor() as cursor:
+                    cursor.execute(f"DROP TABLE IF EXISTS {table}")
+
+            size_text = f", {size / (1024 * 1024):.1f} MiB data+index" if size is not None else ''
+            self.stdout.write(self.style.SUCCESS(
+                f"  - {label}: {elapsed:.2f}s, {rows / elapsed:,.0f} rows/s{size_text}"
+            ))
+
+    def _create_table(self, table, key_type, is_mysql):
+        # WITHOUT ROWID makes SQLite cluster on the key the way InnoDB does
+        suffix = ' ENGINE=InnoDB' if is_mysql else ' WITHOUT ROWID'
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+            cursor.execute(
+                f"CREATE TABLE {table} ("
+                f"id {key_type} NOT NULL PRIMARY KEY, "
+                f"session_id {key_type} NOT NULL, "
+                f"timestamp DATETIME(6) NOT NULL, "
+                f"person_detected BOOL NOT NULL)"
+                f"{suffix}"
+            )
+            cursor.execute(f"CREATE INDEX {table}_session_ts ON {table} (session_id, timestamp)")
+
+    def _insert_rows(self, table, rows, batch_size, new_key, to_db, session_id):
+        sql = f"INSERT INTO {table} (id, session_id, timestamp, person_detected) VALUES (%s, %s, %s, %s)"
+        started = time.perf_counter()
+        for offset in range(0, rows, batch_size):
+            now = timezone.now()
+            batch = [(to_db(new_key()), session_id, now, True) for _ in range(min(batch_size, rows - offset))]
+            with connection.cursor() as cursor:
+                cursor.executemany(sql, batch)
+        return time.perf_counter() - started
+
+    def _table_size(self, table, is_mysql):
+        with connection.cursor() as cursor:
+            if is_mysql:
+                cursor.execute(f"ANALYZE TABLE {table}")
+                cursor.fetchall()
+                cursor.execute(
+                    "SELECT DATA_LENGTH + INDEX_LENGTH FROM information_schema.TABLES "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                    [table]
+                )
+                return cursor.fetchone()[0]
+            try:
+                cursor.execute("SELECT SUM(pgsize) FROM dbstat WHERE name LIKE %s", [f"{table}%"])
+                return cursor.fetchone()[0]
+            except Exception:
+                # dbstat is an optional SQLite extension
+                return None
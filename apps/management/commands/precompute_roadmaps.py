@@ -0,0 +1,86 @@
+# apps/management/commands/precompute_roadmaps.py
+
+import logging
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from apps.models import CareerRoadmap
+from apps.roadmaps import generate_base_roadmap, popular_careers
+
+logger = logging.getLogger(__name__)
+
+LOCK_KEY = 'precompute_roadmaps:lock'
+ONE_OFF_LOCK_SECONDS = 60 * 60  # how long a single run (no --interval) holds the lock at most
+
+
+class Command(BaseCommand):
+    help = 'Pre-generates base AI roadmaps for the most popular careers into the shared roadmap store.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=25,
+                            help='Number of careers (ranked by action plan count) to precompute.')
+        parser.add_argument('--max-age-hours', type=int, default=24 * 7,
+                            help='Regenerate stored roadmaps older than this.')
+        parser.add_argument('--interval', type=int, default=0,
+                            help='If set, keep running and repeat every INTERVAL seconds.')
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        while True:
+            try:
+                self.run_round(options['top'], options['max_age_hours'], interval)
+            except Exception as e:
+                # A transient error (the database or cache being unreachable) costs one round, not the loop
+                logger.exception(f"[PrecomputeRoadmaps] Run failed: {e}")
+                self.stderr.write(f"Run failed: {e}")
+                if not interval:
+                    raise
+            if not interval:
+                return
+            self.stdout.write(f"Sleeping {interval}s until the next run...")
+            time.sleep(interval)
+
+    def run_round(self, top, max_age_hours, interval):
+        # Every web instance starts this command; the shared cache lock lets only one of them
+        # run per interval. The lock is kept until it expires, so the others skip this round
+        # instead of repeating it as soon as the winner finishes.
+        if not cache.add(LOCK_KEY, True, interval or ONE_OFF_LOCK_SECONDS):
+            self.stdout.write("Another instance is precomputing roadmaps this round; skipping.")
+            return
+        # A connection left idle through the sleep may have been dropped by the server
+        close_old_connections()
+        try:
+            self.run_once(top, max_age_hours)
+        finally:
+            close_old_connections()
+            if not interval:
+                cache.delete(LOCK_KEY)
+
+    def run_once(self, top, max_age_hours):
+        self.stdout.write(f"Precomputing base roadmaps for the top {top} careers...")
+        stale_before = timezone.now() - timedelta(hours=max_age_hours)
+        fresh_ids = set(
+            CareerRoadmap.objects.filter(generated_at__gte=stale_before).values_list('career_id', flat=True)
+        )
+
+        generated, skipped, failed = 0, 0, 0
+        for career in popular_careers(top):
+            if career.id in fresh_ids:
+                skipped += 1
+                continue
+            try:
+                generate_base_roadmap(career)
+                generated += 1
+                self.stdout.write(self.style.SUCCESS(f"  - Generated roadmap for '{career.name}'."))
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"  - Failed to generate roadmap for '{career.name}': {e}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Finished: {generated} generated, {skipped} already fresh, {failed} failed."
+        ))
@@ -7,6 +7,7 @@ from django.conf import settings
 from django.urls import reverse  # <-- Add this import
 from django.contrib.sites.models import Site  # <-- Add this import
 from twilio.rest import Client
+from apps import outbound
 from apps.models import UserProfile, Opportunity, InterviewSession, ActionPlan, CareerJourney
 
 logger = logging.getLogger(__name__)
@@ -95,7 +96,7 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         self.stdout.write("Starting to send WhatsApp digests...")
         try:
-            client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
+            client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN, http_client=outbound.twilio_http_client())
         except Exception as e:
             self.stderr.write(f"Failed to initialize Twilio client: {e}")
             return
@@ -0,0 +1,63 @@
+from django.db import migrations, models
+
+
+def _normalize(name):
+    return " ".join((name or "").split()).casefold()
+
+
+def populate_name_keys(apps, schema_editor):
+    """
+    Fills in `name_key` for existing careers. Careers whose names only differ by case or
+    spacing are merged into the oldest row so the unique index can be added.
+    """
+    Career = apps.get_model('apps', 'Career')
+    ActionPlan = apps.get_model('apps', 'ActionPlan')
+    Opportunity = apps.get_model('apps', 'Opportunity')
+
+    keepers = {}
+    for career in Career.objects.order_by('id'):
+        key = _normalize(career.name)
+        keeper = keepers.get(key)
+        if keeper is None:
+            career.name_key = key
+            career.save(update_fields=['name_key'])
+            keepers[key] = career
+            continue
+
+        for plan in ActionPlan.objects.filter(career=career):
+            existing = ActionPlan.objects.filter(user_id=plan.user_id, career=keeper).first()
+            if existing is None:
+                plan.career = keeper
+                plan.save(update_fields=['career'])
+            else:
+                Opportunity.objects.filter(action_plan=plan).update(action_plan=existing)
+                if not existing.roadmap_content and plan.roadmap_content:
+                    existing.roadmap_content = plan.roadmap_content
+                    existing.save(update_fields=['roadmap_content'])
+                plan.delete()
+
+        if not keeper.keywords and career.keywords:
+            keeper.keywords = career.keywords
+            keeper.save(update_fields=['keywords'])
+        career.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apps', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='career',
+            name='name_key',
+            field=models.CharField(editable=False, help_text='Normalized name used for case-insensitive lookups.', max_length=255, null=True),
+        ),
+        migrations.RunPython(populate_name_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='career',
+            name='name_key',
+            field=models.CharField(editable=False, help_text='Normalized name used for case-insensitive lookups.', max_length=255, unique=True),
+        ),
+    ]
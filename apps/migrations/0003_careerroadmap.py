@@ -0,0 +1,21 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apps', '0002_career_name_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CareerRoadmap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('roadmap', models.JSONField(help_text='Structured roadmap data as returned by the AI.')),
+                ('generated_at', models.DateTimeField(auto_now=True)),
+                ('career', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='base_roadmap', to='apps.career')),
+            ],
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apps', '0003_careerroadmap'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='actionplan',
+            name='roadmap_data',
+            field=models.JSONField(blank=True, help_text='Structured AI-generated roadmap: its steps and the customization used.', null=True),
+        ),
+    ]
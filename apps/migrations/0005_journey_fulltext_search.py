@@ -0,0 +1,58 @@
+from django.db import migrations
+
+FTS_TABLE = 'apps_journey_search'
+
+# (index name, table, column) for the InnoDB FULLTEXT indexes used in production
+MYSQL_FULLTEXT_INDEXES = [
+    ('apps_careerjourney_title_ft', 'apps_careerjourney', 'title'),
+    ('apps_journeyfolder_name_ft', 'apps_journeyfolder', 'name'),
+    ('apps_chatmessage_message_ft', 'apps_chatmessage', 'message'),
+]
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'mysql':
+        for index_name, table, column in MYSQL_FULLTEXT_INDEXES:
+            schema_editor.execute(f"CREATE FULLTEXT INDEX {index_name} ON {table} ({column})")
+
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            "body, kind UNINDEXED, ref_id UNINDEXED, journey_id UNINDEXED, user_id UNINDEXED, "
+            "tokenize = 'unicode61')"
+        )
+        # Backfill from the existing rows; new writes are indexed by apps/signals.py
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE} (body, kind, ref_id, journey_id, user_id) "
+            "SELECT title, 'journey', id, id, user_id FROM apps_careerjourney"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE} (body, kind, ref_id, journey_id, user_id) "
+            "SELECT name, 'folder', id, NULL, user_id FROM apps_journeyfolder"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE} (body, kind, ref_id, journey_id, user_id) "
+            "SELECT m.message, 'message', CAST(m.id AS TEXT), m.journey_id, j.user_id "
+            "FROM apps_chatmessage m JOIN apps_careerjourney j ON j.id = m.journey_id"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'mysql':
+        for index_name, table, column in MYSQL_FULLTEXT_INDEXES:
+            schema_editor.execute(f"DROP INDEX {index_name} ON {table}")
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apps', '0004_actionplan_roadmap_data'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,50 @@
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+LAST_MESSAGE_PREVIEW_LENGTH = 255
+
+
+def backfill_message_counters(apps, schema_editor):
+    CareerJourney = apps.get_model('apps', 'CareerJourney')
+    ChatMessage = apps.get_model('apps', 'ChatMessage')
+
+    stats = ChatMessage.objects.values('journey_id').annotate(total=Count('id'), last_at=Max('timestamp'))
+    for row in stats.iterator():
+        last_message = (
+            ChatMessage.objects.filter(journey_id=row['journey_id'])
+            .order_by('-timestamp', '-id')
+            .values_list('message', flat=True)
+            .first()
+        )
+        # .update() leaves updated_at (auto_now) untouched, so the journey list order is preserved
+        CareerJourney.objects.filter(pk=row['journey_id']).update(
+            message_count=row['total'],
+            last_message_at=row['last_at'],
+            last_message_preview=(last_message or '')[:LAST_MESSAGE_PREVIEW_LENGTH],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apps', '0005_journey_fulltext_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='careerjourney',
+            name='message_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='careerjourney',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='careerjourney',
+            name='last_message_preview',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.RunPython(backfill_message_counters, migrations.RunPython.noop),
+    ]
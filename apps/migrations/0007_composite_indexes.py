@@ -0,0 +1,39 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apps', '0006_careerjourney_message_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='careerjourney',
+            index=models.Index(fields=['user', 'folder', 'updated_at'], name='journey_user_folder_upd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['journey', 'timestamp', 'id'], name='chatmsg_journey_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='opportunity',
+            index=models.Index(fields=['action_plan', 'found_at'], name='opp_plan_found_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='opportunity',
+            index=models.Index(fields=['action_plan', 'is_tracked'], name='opp_plan_tracked_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='interviewsession',
+            index=models.Index(fields=['user', 'status', 'start_time'], name='interview_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='interviewturn',
+            index=models.Index(fields=['session', 'timestamp'], name='turn_session_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='interviewanalysispoint',
+            index=models.Index(fields=['session', 'timestamp'], name='analysis_session_ts_idx'),
+        ),
+    ]
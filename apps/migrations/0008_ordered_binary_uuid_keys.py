@@ -0,0 +1,80 @@
+from django.db import migrations
+
+import apps.fields
+
+# (table, column) for every primary key switched to OrderedUUIDField, and every foreign key pointing at one
+UUID_COLUMNS = [
+    ('apps_journeyfolder', 'id'),
+    ('apps_careerjourney', 'id'),
+    ('apps_careerjourney', 'folder_id'),
+    ('apps_chatmessage', 'journey_id'),
+    ('apps_actionplan', 'id'),
+    ('apps_opportunity', 'action_plan_id'),
+    ('apps_interviewsession', 'id'),
+    ('apps_interviewturn', 'id'),
+    ('apps_interviewturn', 'session_id'),
+    ('apps_interviewanalysispoint', 'id'),
+    ('apps_interviewanalysispoint', 'session_id'),
+    ('apps_interviewresult', 'session_id'),
+]
+
+
+def _column_nullable(schema_editor, table, column):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT IS_NULLABLE FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s",
+            [table, column]
+        )
+        return cursor.fetchone()[0] == 'YES'
+
+
+def _convert_columns(schema_editor, final_type, convert_sql):
+    # Going through VARBINARY keeps the stored bytes as-is, so the values can be rewritten
+    # in place before the final type is applied. Foreign key checks are off while the
+    # referenced and referencing columns are briefly out of step.
+    schema_editor.execute("SET FOREIGN_KEY_CHECKS = 0")
+    try:
+        for table, column in UUID_COLUMNS:
+            null = 'NULL' if _column_nullable(schema_editor, table, column) else 'NOT NULL'
+            schema_editor.execute(f"ALTER TABLE {table} MODIFY {column} VARBINARY(32) {null}")
+            schema_editor.execute(f"UPDATE {table} SET {column} = {convert_sql.format(column=column)}")
+            schema_editor.execute(f"ALTER TABLE {table} MODIFY {column} {final_type} {null}")
+    finally:
+        schema_editor.execute("SET FOREIGN_KEY_CHECKS = 1")
+
+
+def uuids_to_binary(apps, schema_editor):
+    # Only MySQL changes column type; other databases keep Django's usual UUID column
+    if schema_editor.connection.vendor == 'mysql':
+        _convert_columns(schema_editor, 'BINARY(16)', 'UNHEX({column})')
+
+
+def uuids_to_char(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        _convert_columns(schema_editor, 'CHAR(32)', 'LOWER(HEX({column}))')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apps', '0007_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(uuids_to_binary, uuids_to_char),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name=model_name,
+                    name='id',
+                    field=apps.fields.OrderedUUIDField(default=apps.fields.uuid7, editable=False,
+                                                       primary_key=True, serialize=False),
+                )
+                for model_name in ('journeyfolder', 'careerjourney', 'actionplan', 'interviewsession',
+                                   'interviewturn', 'interviewanalysispoint')
+            ],
+        ),
+    ]
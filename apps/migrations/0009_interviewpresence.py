@@ -0,0 +1,22 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apps', '0008_ordered_binary_uuid_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InterviewPresence',
+            fields=[
+                ('session', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='presence', serialize=False, to='apps.interviewsession')),
+                ('frames_total', models.PositiveIntegerField(default=0)),
+                ('frames_present', models.PositiveIntegerField(default=0)),
+                ('timeline', models.TextField(blank=True, default='')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -1,8 +1,9 @@
 from django.db import models
 from django.contrib.auth.models import User
-import uuid
 from django.utils import timezone
 
+from .fields import OrderedUUIDField, uuid7
+
 
 # ==============================================================================
 # Cariera.AI - USER PROFILE & PERSONALITY TEST MODELS
@@ -63,20 +64,53 @@ class UserPersonalityTestAnswer(models.Model):
 # Cariera.AI - CAREER & CHAT MODELS
 # ==============================================================================
 
+def normalize_career_name(name):
+    """
+    Builds the lookup key for a career title: casefolded with runs of whitespace
+    collapsed, so "Software  Engineer" and "software engineer" resolve to the same row.
+    """
+    return " ".join((name or "").split()).casefold()
+
+
+class CareerManager(models.Manager):
+
+    def resolve(self, title):
+        """
+        Returns (career, created) for a free-text career title.
+
+        This is a single lookup on the unique `name_key` index. If two requests race to
+        create the same career, the loser's INSERT hits the unique constraint and
+        get_or_create falls back to fetching the winner's row, so no duplicates are made.
+        """
+        display_name = " ".join(title.split())
+        return self.get_or_create(
+            name_key=normalize_career_name(display_name),
+            defaults={'name': display_name}
+        )
+
+
 class Career(models.Model):
     name = models.CharField(max_length=255, unique=True)
+    name_key = models.CharField(max_length=255, unique=True, editable=False,
+                                help_text="Normalized name used for case-insensitive lookups.")
     keywords = models.TextField(help_text="Comma-separated list of keywords, skills, and interests related to this career.")
     holland_code = models.CharField(max_length=3, blank=True, null=True, help_text="Primary 3-letter Holland Code for this career.")
 
+    objects = CareerManager()
+
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.name_key = normalize_career_name(self.name)
+        super().save(*args, **kwargs)
+
     class Meta:
         ordering = ['name']
 
 
 class JourneyFolder(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = OrderedUUIDField(primary_key=True, default=uuid7, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="journey_folders")
     name = models.CharField(max_length=100)
     order = models.PositiveIntegerField(default=0, help_text="Order of the folder in the user's list.")
@@ -91,18 +125,27 @@ class JourneyFolder(models.Model):
 
 
 class CareerJourney(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = OrderedUUIDField(primary_key=True, default=uuid7, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="career_journeys")
     folder = models.ForeignKey(JourneyFolder, on_delete=models.SET_NULL, null=True, blank=True, related_name="journeys")
     title = models.CharField(max_length=200, default="New Career Journey")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Denormalized from ChatMessage, kept current by apps/signals.py when a message is created
+    message_count = models.PositiveIntegerField(default=0)
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    last_message_preview = models.CharField(max_length=255, blank=True, default='')
+
     def __str__(self):
         return f"{self.title} ({self.user.username})"
 
     class Meta:
         ordering = ['-updated_at']
+        indexes = [
+            # Journey list: a user's journeys per folder (or unfoldered), newest first
+            models.Index(fields=['user', 'folder', 'updated_at'], name='journey_user_folder_upd_idx'),
+        ]
 
 
 class ChatMessage(models.Model):
@@ -117,17 +160,23 @@ class ChatMessage(models.Model):
 
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            # Chat history and keyset pagination on (timestamp, id) within a journey
+            models.Index(fields=['journey', 'timestamp', 'id'], name='chatmsg_journey_ts_idx'),
+        ]
 
 
 class ActionPlan(models.Model):
     """
     Connects a user to a specific career they are planning for.
     """
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = OrderedUUIDField(primary_key=True, default=uuid7, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="action_plans")
     career = models.ForeignKey(Career, on_delete=models.CASCADE, related_name="action_plans")
 
-    # --- ADD THIS NEW FIELD ---
+    roadmap_data = models.JSONField(blank=True, null=True,
+                                    help_text="Structured AI-generated roadmap: its steps and the customization used.")
+    # Legacy pre-rendered HTML roadmaps. New roadmaps are stored in `roadmap_data` instead.
     roadmap_content = models.TextField(blank=True, null=True,
                                        help_text="AI-generated step-by-step plan for this career.")
 
@@ -141,6 +190,19 @@ class ActionPlan(models.Model):
         unique_together = ('user', 'career')
 
 
+class CareerRoadmap(models.Model):
+    """
+    The shared, career-generic roadmap. Precomputed for popular careers so users who
+    don't customize their roadmap get it without waiting on the AI.
+    """
+    career = models.OneToOneField(Career, on_delete=models.CASCADE, related_name="base_roadmap")
+    roadmap = models.JSONField(help_text="Structured roadmap data as returned by the AI.")
+    generated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Base roadmap for {self.career.name}"
+
+
 class Opportunity(models.Model):
     """
     Stores a single job, scholarship, or other opportunity found by the AI agent.
@@ -167,6 +229,10 @@ class Opportunity(models.Model):
 
     class Meta:
         ordering = ['-found_at']
+        indexes = [
+            models.Index(fields=['action_plan', 'found_at'], name='opp_plan_found_idx'),
+            models.Index(fields=['action_plan', 'is_tracked'], name='opp_plan_tracked_idx'),
+        ]
 
 # ==============================================================================
 # AI INTERVIEW MODELS
@@ -175,7 +241,7 @@ class Opportunity(models.Model):
 class InterviewSession(models.Model):
     # ... (This model is unchanged) ...
     DIFFICULTY_CHOICES = [('simple', 'Simple'), ('standard', 'Standard'), ('hard', 'Hard')]
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = OrderedUUIDField(primary_key=True, default=uuid7, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='interview_sessions')
     title = models.CharField(max_length=255, blank=True, null=True, help_text="A user-editable title for the session.")
     context = models.TextField(blank=True, null=True, help_text="The user-provided context for the interview (e.g., job role, scholarship type).")
@@ -193,9 +259,15 @@ class InterviewSession(models.Model):
             self.title = f"Interview on {local_start_time.strftime('%B %d, %Y at %I:%M %p')}"
         super().save(*args, **kwargs)
 
+    class Meta:
+        indexes = [
+            # Past interviews and progress charts: a user's completed sessions by start time
+            models.Index(fields=['user', 'status', 'start_time'], name='interview_user_status_idx'),
+        ]
+
 class InterviewTurn(models.Model):
     # ... (This model is unchanged) ...
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = OrderedUUIDField(primary_key=True, default=uuid7, editable=False)
     session = models.ForeignKey(InterviewSession, on_delete=models.CASCADE, related_name='turns')
     speaker = models.CharField(max_length=10, choices=[('user', 'User'), ('ai', 'AI')])
     text = models.TextField()
@@ -203,14 +275,40 @@ class InterviewTurn(models.Model):
     def __str__(self):
         return f"{self.speaker.title()} at {self.timestamp.strftime('%H:%M:%S')}"
 
-# --- NEW MODEL ---
+    class Meta:
+        indexes = [
+            models.Index(fields=['session', 'timestamp'], name='turn_session_ts_idx'),
+        ]
+
+# Legacy: one row per analyzed frame. New sessions record presence in InterviewPresence instead.
 class InterviewAnalysisPoint(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = OrderedUUIDField(primary_key=True, default=uuid7, editable=False)
     session = models.ForeignKey(InterviewSession, on_delete=models.CASCADE, related_name='analysis_points')
     timestamp = models.DateTimeField(auto_now_add=True)
     # --- This is the correct final state ---
     person_detected = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['session', 'timestamp'], name='analysis_session_ts_idx'),
+        ]
+
+
+class InterviewPresence(models.Model):
+    """
+    Camera presence for a whole interview session in one row: frame counters plus a
+    timeline with one character per analyzed frame ('1' present, '0' absent).
+    Written by apps/presence.py, which appends to it in place as frames come in.
+    """
+    session = models.OneToOneField(InterviewSession, on_delete=models.CASCADE, primary_key=True, related_name='presence')
+    frames_total = models.PositiveIntegerField(default=0)
+    frames_present = models.PositiveIntegerField(default=0)
+    timeline = models.TextField(blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Presence for {self.session}: {self.frames_present}/{self.frames_total} frames"
+
 
 class InterviewResult(models.Model):
     session = models.OneToOneField(InterviewSession, on_delete=models.CASCADE, related_name='result')
@@ -0,0 +1,247 @@
+# apps/outbound.py
+#
+# The shared outbound HTTP layer. Every integration goes through here instead of
+# calling `requests` directly, so that:
+#   - connections are kept alive in per-host pools, with no new TLS handshake per call
+#   - every call has a timeout, even if the caller forgets one
+#   - connection failures (and, for idempotent methods, 429/5xx responses) are retried
+#     with backoff
+#   - each host gets a limited number of concurrent calls, so one slow vendor can't
+#     tie up every worker thread; callers over the limit wait briefly, then get HostBusy
+#   - each host has a circuit breaker (see resilience.py); while a host is failing,
+#     calls to it fail at once with HostUnavailable instead of waiting out timeouts
+#
+# Sync callers use get()/post()/request(); Azure SDK clients take azure_transport(), and
+# the Twilio client takes twilio_http_client().
+# Async callers use async_request() on the event loop. SDKs built on httpx (openai) take
+# httpx_client() / async_httpx_client(); their callers hold host_slot() / async_host_slot()
+# around each call and keep their own breaker, as llm.py does per deployment.
+
+import asyncio
+import logging
+import threading
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from azure.core.pipeline.transport import RequestsTransport
+from requests.adapters import HTTPAdapter
+from twilio.http import HttpClient as TwilioHttpClient
+from twilio.http.response import Response as TwilioResponse
+from urllib3.util.retry import Retry
+
+from .resilience import CircuitOpen, get_breaker
+
+DEFAULT_TIMEOUT = (3.05, 20)      # (connect, read) seconds
+MAX_CONNECTIONS_PER_HOST = 20     # keep-alive pool size, and concurrent calls allowed per host
+HOST_WAIT_SECONDS = 10            # how long a call waits for a free slot on its host
+
+RETRY = Retry(
+    total=3,
+    connect=2,
+    read=1,
+    status=2,
+    backoff_factor=0.3,
+    status_forcelist=(429, 502, 503, 504),
+    # Status and read retries only for idempotent methods; a POST is retried only if it never connected
+    allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+    respect_retry_after_header=True,
+    raise_on_status=False,
+)
+
+
+class HostBusy(requests.exceptions.RequestException):
+    """Raised when a host already has MAX_CONNECTIONS_PER_HOST calls in flight for too long."""
+
+
+class HostUnavailable(CircuitOpen, requests.exceptions.ConnectionError):
+    """Raised without making the call while a host's circuit breaker is open."""
+
+
+def breaker_for(host):
+    return get_breaker(host, exception_class=HostUnavailable)
+
+
+def _is_server_failure(status_code):
+    return status_code >= 500 or status_code == 429
+
+
+# ==============================================================================
+# SYNC
+# ==============================================================================
+
+_host_slots = {}
+_host_slots_lock = threading.Lock()
+
+
+def _slots_for(host):
+    with _host_slots_lock:
+        if host not in _host_slots:
+            _host_slots[host] = threading.BoundedSemaphore(MAX_CONNECTIONS_PER_HOST)
+        return _host_slots[host]
+
+
+@contextmanager
+def host_slot(url):
+    host = urlsplit(url).hostname
+    slots = _slots_for(host)
+    if not slots.acquire(timeout=HOST_WAIT_SECONDS):
+        raise HostBusy(f"Too many concurrent requests to {host}.")
+    try:
+        yield
+    finally:
+        slots.release()
+
+
+class OutboundSession(requests.Session):
+    """A requests.Session with a default timeout and a per-host concurrency limit."""
+
+    def request(self, method, url, *args, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = DEFAULT_TIMEOUT
+        with host_slot(url), breaker_for(urlsplit(url).hostname).guard() as call:
+            response = super().request(method, url, *args, **kwargs)
+            if _is_server_failure(response.status_code):
+                call.fail()
+            return response
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """The process-wide OutboundSession."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = OutboundSession()
+                adapter = HTTPAdapter(pool_connections=32, pool_maxsize=MAX_CONNECTIONS_PER_HOST, max_retries=RETRY)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+
+def request(method, url, **kwargs):
+    return get_session().request(method, url, **kwargs)
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
+
+
+def azure_transport():
+    """An azure-core transport on the shared session, for Azure SDK clients."""
+    # session_owner=False: the SDK client must not close (or re-mount) the shared session
+    return RequestsTransport(session=get_session(), session_owner=False)
+
+
+class _OutboundTwilioClient(TwilioHttpClient):
+    """Sends the Twilio SDK's requests through request() instead of its own session."""
+
+    def __init__(self):
+        super().__init__(logger=logging.getLogger('twilio.http_client'), is_async=False)
+
+    def request(self, method, url, params=None, data=None, headers=None, auth=None, timeout=None,
+                allow_redirects=False):
+        kwargs = dict(params=params, headers=headers, auth=auth, timeout=timeout or self.timeout,
+                      allow_redirects=allow_redirects)
+        if headers and headers.get('Content-Type') in ('application/json', 'application/scim+json'):
+            kwargs['json'] = data
+        else:
+            kwargs['data'] = data
+        response = request(method.upper(), url, **kwargs)
+        return TwilioResponse(int(response.status_code), response.text, response.headers)
+
+
+def twilio_http_client():
+    """An http_client for twilio.rest.Client, on the shared session."""
+    return _OutboundTwilioClient()
+
+
+# ==============================================================================
+# HTTPX
+# ==============================================================================
+# httpx clients belong to the event loop they were first used on, so there is one per
+# loop, dropped along with the loop.
+
+HTTPX_LIMITS = httpx.Limits(max_keepalive_connections=MAX_CONNECTIONS_PER_HOST, max_connections=MAX_CONNECTIONS_PER_HOST)
+
+_async_clients = weakref.WeakKeyDictionary()
+_async_host_slots = weakref.WeakKeyDictionary()
+
+
+def _httpx_timeout(timeout):
+    if timeout is None:
+        timeout = DEFAULT_TIMEOUT
+    if isinstance(timeout, httpx.Timeout):
+        return timeout
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        return httpx.Timeout(read, connect=connect)
+    return httpx.Timeout(timeout)
+
+
+def httpx_client(timeout=None):
+    """
+    An httpx.Client for one host, for SDKs that take one. Connection failures are
+    retried like the shared session's; status retries are left to the SDK.
+    """
+    return httpx.Client(timeout=_httpx_timeout(timeout),
+                        transport=httpx.HTTPTransport(retries=RETRY.connect, limits=HTTPX_LIMITS))
+
+
+def async_httpx_client(timeout=None):
+    """httpx_client() for async SDKs. Create one per event loop."""
+    return httpx.AsyncClient(timeout=_httpx_timeout(timeout),
+                             transport=httpx.AsyncHTTPTransport(retries=RETRY.connect, limits=HTTPX_LIMITS))
+
+
+@asynccontextmanager
+async def async_host_slot(url):
+    """host_slot() for the event loop; slots are per loop, like the clients."""
+    host = urlsplit(url).hostname
+    loop_slots = _async_host_slots.setdefault(asyncio.get_running_loop(), {})
+    slots = loop_slots.setdefault(host, asyncio.Semaphore(MAX_CONNECTIONS_PER_HOST))
+    try:
+        await asyncio.wait_for(slots.acquire(), HOST_WAIT_SECONDS)
+    except asyncio.TimeoutError:
+        raise HostBusy(f"Too many concurrent requests to {host}.")
+    try:
+        yield
+    finally:
+        slots.release()
+
+
+def get_async_client():
+    """The shared httpx.AsyncClient for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            timeout=_httpx_timeout(DEFAULT_TIMEOUT),
+            limits=httpx.Limits(max_keepalive_connections=MAX_CONNECTIONS_PER_HOST * 4,
+                                max_connections=MAX_CONNECTIONS_PER_HOST * 8),
+            # Retries connection failures only; the request was never sent, so it's safe for any method
+            transport=httpx.AsyncHTTPTransport(retries=RETRY.connect),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def async_request(method, url, timeout=None, **kwargs):
+    """Makes a request with the shared async client, limited per host like the sync API."""
+    async with async_host_slot(url):
+        with breaker_for(urlsplit(url).hostname).guard() as call:
+            response = await get_async_client().request(method, url, timeout=_httpx_timeout(timeout), **kwargs)
+            if _is_server_failure(response.status_code):
+                call.fail()
+            return response
@@ -0,0 +1,85 @@
+# apps/presence.py
+#
+# Camera presence during an interview, stored as a single InterviewPresence row per
+# session. Each analyzed frame bumps two counters and appends one character to the
+# timeline in a single UPDATE, so a session costs one row however long it runs, and
+# the end-of-interview analysis reads that one row back.
+
+import itertools
+import logging
+from collections import namedtuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, TextField, Value
+from django.db.models.functions import Concat
+from django.utils import timezone
+
+from .models import InterviewAnalysisPoint, InterviewPresence
+
+logger = logging.getLogger(__name__)
+
+PRESENT, ABSENT = '1', '0'
+
+PresenceSummary = namedtuple('PresenceSummary', ['frames_total', 'frames_present', 'runs'])
+
+
+def _append_frame(session_id, person_detected, mark):
+    """Appends the frame to an existing presence row. Returns False if the session has no row."""
+    return bool(InterviewPresence.objects.filter(session_id=session_id).update(
+        frames_total=F('frames_total') + 1,
+        frames_present=F('frames_present') + (1 if person_detected else 0),
+        timeline=Concat(F('timeline'), Value(mark), output_field=TextField()),
+        updated_at=timezone.now(),
+    ))
+
+
+def record_frame(session_id, person_detected):
+    """Adds one analyzed frame to the session's presence row, creating the row on the first frame."""
+    mark = PRESENT if person_detected else ABSENT
+    if _append_frame(session_id, person_detected, mark):
+        return
+
+    try:
+        with transaction.atomic():
+            InterviewPresence.objects.create(
+                session_id=session_id,
+                frames_total=1,
+                frames_present=1 if person_detected else 0,
+                timeline=mark,
+            )
+    except IntegrityError:
+        # Usually another frame for this session created the row first. If the row still
+        # isn't there, the session itself is gone (e.g. deleted mid-interview).
+        if not _append_frame(session_id, person_detected, mark):
+            logger.warning(f"[Presence] Dropping a frame for interview session {session_id}, which no longer exists.")
+
+
+def presence_runs(timeline):
+    """Run-length encodes a timeline into [(present, frame_count), ...]."""
+    return [(mark == PRESENT, len(list(group))) for mark, group in itertools.groupby(timeline)]
+
+
+def get_presence_summary(session_id):
+    """
+    Returns the session's PresenceSummary, or None if no frames were analyzed.
+    Sessions recorded before InterviewPresence existed are summarized from their
+    InterviewAnalysisPoint rows in one aggregate query.
+    """
+    presence = InterviewPresence.objects.filter(session_id=session_id).first()
+    if presence is not None:
+        return PresenceSummary(presence.frames_total, presence.frames_present, presence_runs(presence.timeline))
+
+    legacy = InterviewAnalysisPoint.objects.filter(session_id=session_id).aggregate(
+        total=Count('pk'),
+        present=Count('pk', filter=Q(person_detected=True)),
+    )
+    if not legacy['total']:
+        return None
+    return PresenceSummary(legacy['total'], legacy['present'], [])
+
+
+def presence_score(summary):
+    """The camera presence score (0-100) for a PresenceSummary."""
+    if summary is None or not summary.frames_total:
+        return 0
+    return int(summary.frames_present / summary.frames_total * 100)
@@ -0,0 +1,178 @@
+# apps/quota.py
+#
+# Token-per-minute budgets for Azure OpenAI deployments, shared by every worker.
+#
+# Each deployment has a token bucket that holds up to one minute of its TPM quota and
+# refills continuously. A completion takes its estimated token count (prompt plus
+# max_tokens) before it is sent, and is settled against the real usage afterwards.
+# When the bucket can't cover a call, the caller waits for the refill instead of
+# sending it to Azure to collect a 429, so peak-hour throughput stays at the quota.
+#
+# Priorities share the bucket through reserves: low-priority work (insights, titling)
+# may only spend down to 30% of the bucket and normal work to 10%, which leaves the
+# rest for live interview turns. Low-priority work waits only briefly, then is shed.
+#
+# With the django-redis cache the bucket lives in Redis and is updated by a Lua script,
+# so all workers draw from one budget. With any other cache (or if Redis is
+# unreachable) each process keeps an in-memory bucket instead.
+
+import asyncio
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+HIGH, NORMAL, LOW = 'high', 'normal', 'low'
+
+PRIORITY_RESERVE = {HIGH: 0.0, NORMAL: 0.1, LOW: 0.3}   # share of the bucket a priority must leave
+PRIORITY_MAX_WAIT = {HIGH: 20.0, NORMAL: 10.0, LOW: 2.0}  # seconds to wait for tokens before giving up
+MAX_WAIT_STEP = 1.0  # re-check at least this often while waiting, since other workers refund too
+
+
+class QuotaExceeded(Exception):
+    """Raised when a call can't get its tokens within its priority's wait budget."""
+
+    def __init__(self, bucket, retry_after):
+        super().__init__(f"Token quota for {bucket} is exhausted; retry in {retry_after:.0f}s.")
+        self.retry_after = retry_after
+
+
+class TokenBucket(ABC):
+
+    def __init__(self, name, tokens_per_minute):
+        self.name = name
+        self.capacity = float(tokens_per_minute)
+        self.rate = self.capacity / 60.0
+
+    @abstractmethod
+    def take(self, tokens, reserve=0.0, force=False):
+        """
+        Takes `tokens` if that leaves at least `reserve` tokens in the bucket (or always,
+        with force=True; negative `tokens` refunds). Returns (taken, seconds_until_possible).
+        """
+
+    async def atake(self, tokens, reserve=0.0, force=False):
+        return self.take(tokens, reserve, force)
+
+    def _plan(self, tokens, priority):
+        reserve = self.capacity * PRIORITY_RESERVE[priority]
+        # A call bigger than the bucket could never fit; let it take everything above the reserve
+        return min(tokens, self.capacity - reserve), reserve
+
+    def acquire(self, tokens, priority=NORMAL):
+        """Takes tokens for a call, waiting for the refill if needed. Returns the amount taken."""
+        tokens, reserve = self._plan(tokens, priority)
+        deadline = time.monotonic() + PRIORITY_MAX_WAIT[priority]
+        while True:
+            taken, wait = self.take(tokens, reserve)
+            if taken:
+                return tokens
+            remaining = deadline - time.monotonic()
+            if wait > remaining:
+                raise QuotaExceeded(self.name, wait)
+            time.sleep(min(wait, MAX_WAIT_STEP))
+
+    async def aacquire(self, tokens, priority=NORMAL):
+        tokens, reserve = self._plan(tokens, priority)
+        deadline = time.monotonic() + PRIORITY_MAX_WAIT[priority]
+        while True:
+            taken, wait = await self.atake(tokens, reserve)
+            if taken:
+                return tokens
+            remaining = deadline - time.monotonic()
+            if wait > remaining:
+                raise QuotaExceeded(self.name, wait)
+            await asyncio.sleep(min(wait, MAX_WAIT_STEP))
+
+    def settle(self, taken, used):
+        """Corrects the bucket once a call's real usage is known (refunds unused tokens)."""
+        if used != taken:
+            self.take(used - taken, force=True)
+
+    async def asettle(self, taken, used):
+        if used != taken:
+            await self.atake(used - taken, force=True)
+
+
+class LocalTokenBucket(TokenBucket):
+    """In-process bucket: the stand-in when there's no shared Redis."""
+
+    def __init__(self, name, tokens_per_minute):
+        super().__init__(name, tokens_per_minute)
+        self._level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, tokens, reserve=0.0, force=False):
+        with self._lock:
+            now = time.monotonic()
+            self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+            self._updated = now
+            if force or self._level - tokens >= reserve:
+                self._level -= tokens
+                return True, 0.0
+            return False, (tokens + reserve - self._level) / self.rate
+
+
+# Refill, then take if the level stays above the reserve. Uses the server clock, so workers
+# with skewed clocks still agree. The level may go negative when usage is settled above
+# the estimate; that debt is paid back by the refill before anything else is admitted.
+TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local tokens = tonumber(ARGV[3])
+local reserve = tonumber(ARGV[4])
+local force = ARGV[5] == '1'
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'level', 'updated')
+local level = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+level = math.min(capacity, level + math.max(0, now - updated) * rate)
+
+local taken = 0
+local wait = 0
+if force or level - tokens >= reserve then
+    level = level - tokens
+    taken = 1
+else
+    wait = (tokens + reserve - level) / rate
+end
+redis.call('HSET', KEYS[1], 'level', tostring(level), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+return {taken, tostring(wait)}
+"""
+
+
+class RedisTokenBucket(TokenBucket):
+    """Bucket shared by all workers through Redis. Falls back to a local bucket if Redis fails."""
+
+    def __init__(self, name, tokens_per_minute):
+        super().__init__(name, tokens_per_minute)
+        from django_redis import get_redis_connection
+        self._script = get_redis_connection('default').register_script(TAKE_SCRIPT)
+        self._key = f"quota:tpm:{name}"
+        self._fallback = LocalTokenBucket(name, tokens_per_minute)
+
+    def take(self, tokens, reserve=0.0, force=False):
+        try:
+            taken, wait = self._script(keys=[self._key], args=[self.capacity, self.rate, tokens, reserve, int(force)])
+        except Exception as e:
+            logger.warning(f"[Quota] Redis unavailable for '{self.name}', using this process's bucket: {e}")
+            return self._fallback.take(tokens, reserve, force)
+        return bool(taken), float(wait)
+
+    async def atake(self, tokens, reserve=0.0, force=False):
+        return await sync_to_async(self.take, thread_sensitive=False)(tokens, reserve, force)
+
+
+def create_bucket(name, tokens_per_minute):
+    if settings.CACHES['default']['BACKEND'].startswith('django_redis'):
+        return RedisTokenBucket(name, tokens_per_minute)
+    return LocalTokenBucket(name, tokens_per_minute)
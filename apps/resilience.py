@@ -0,0 +1,200 @@
+# apps/resilience.py
+#
+# Circuit breakers for outbound dependencies, and stale-value fallbacks for the
+# features that can live with an older answer.
+#
+# A breaker watches the outcomes of recent calls to one dependency. Once enough of them
+# fail within the window it opens, and calls fail immediately with CircuitOpen instead
+# of each waiting out a timeout. After a cool-down it lets a single probe call through
+# (half-open): success closes it again, failure re-opens it for another cool-down.
+# State is per process, which is what matters for keeping this process's workers free.
+
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+WINDOW_SECONDS = 30       # outcomes older than this are forgotten
+MIN_CALLS = 6             # don't judge a dependency on fewer calls than this
+FAILURE_RATE = 0.5        # open when at least this share of calls in the window failed
+OPEN_SECONDS = 20         # how long to fail fast before probing again
+
+STALE_SECONDS = 7 * 24 * 60 * 60  # how long a last-good value is kept for fallbacks
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling a dependency whose breaker is open."""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} is unavailable; retrying in {retry_after:.0f}s.")
+        self.name = name
+        self.retry_after = retry_after
+
+
+def counts_as_failure(exc):
+    """
+    Whether an exception says the dependency is unhealthy. Client errors (4xx other than
+    timeouts and throttling) are our request's fault, so they don't count.
+    """
+    status = getattr(exc, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(exc, 'response', None), 'status_code', None)
+    if status is not None and 400 <= status < 500 and status not in (408, 429):
+        return False
+    return True
+
+
+class _Call:
+    """Handed out by CircuitBreaker.guard(); lets the caller mark a non-raising call as failed."""
+
+    def __init__(self):
+        self.failed = False
+
+    def fail(self):
+        self.failed = True
+
+
+class CircuitBreaker:
+
+    def __init__(self, name, window_seconds=WINDOW_SECONDS, min_calls=MIN_CALLS,
+                 failure_rate=FAILURE_RATE, open_seconds=OPEN_SECONDS, exception_class=CircuitOpen):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.open_seconds = open_seconds
+        self.exception_class = exception_class
+        self.state = CLOSED
+        self._outcomes = deque()  # (monotonic time, ok)
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def available(self):
+        """Whether a call would be let through right now (a hint for routing; guard() decides)."""
+        with self._lock:
+            if self.state == OPEN:
+                return time.monotonic() >= self._opened_at + self.open_seconds
+            return not (self.state == HALF_OPEN and self._probing)
+
+    def _before_call(self):
+        with self._lock:
+            if self.state == OPEN:
+                remaining = self._opened_at + self.open_seconds - time.monotonic()
+                if remaining > 0:
+                    raise self.exception_class(self.name, remaining)
+                self.state = HALF_OPEN
+                logger.info(f"[Circuit] {self.name} half-open; sending a probe.")
+            if self.state == HALF_OPEN:
+                if self._probing:
+                    raise self.exception_class(self.name, self.open_seconds)
+                self._probing = True
+                return True
+            return False
+
+    def _record(self, ok, probe):
+        with self._lock:
+            now = time.monotonic()
+            if probe:
+                self._probing = False
+                if ok:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                    logger.info(f"[Circuit] {self.name} closed; probe succeeded.")
+                else:
+                    self._open(now)
+                return
+
+            self._outcomes.append((now, ok))
+            while self._outcomes and self._outcomes[0][0] < now - self.window_seconds:
+                self._outcomes.popleft()
+            if ok or self.state != CLOSED or len(self._outcomes) < self.min_calls:
+                return
+            failures = sum(1 for _, outcome_ok in self._outcomes if not outcome_ok)
+            if failures / len(self._outcomes) >= self.failure_rate:
+                self._open(now)
+
+    def _open(self, now):
+        self.state = OPEN
+        self._opened_at = now
+        self._outcomes.clear()
+        logger.warning(f"[Circuit] {self.name} opened; failing fast for {self.open_seconds}s.")
+
+    def _release_probe(self, probe):
+        if probe:
+            with self._lock:
+                self._probing = False
+
+    @contextmanager
+    def guard(self):
+        """
+        Wraps one call to the dependency. Raises CircuitOpen (or the breaker's
+        exception_class) up front while open; otherwise records how the call went.
+        """
+        probe = self._before_call()
+        call = _Call()
+        try:
+            yield call
+        except Exception as e:
+            self._record(not counts_as_failure(e), probe)
+            raise
+        except BaseException:
+            # Cancelled, not failed: no verdict on the dependency
+            self._release_probe(probe)
+            raise
+        else:
+            self._record(not call.failed, probe)
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name, **options):
+    """The process-wide breaker for a dependency, created with `options` on first use."""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name, **options)
+        return _breakers[name]
+
+
+# ==============================================================================
+# STALE FALLBACKS
+# ==============================================================================
+
+def with_stale_fallback(cache_key, fetch, timeout=STALE_SECONDS):
+    """
+    Calls fetch() and remembers its result under `cache_key`. If fetch() raises and a
+    remembered value exists, that value is returned instead. Returns (value, is_stale).
+    """
+    try:
+        value = fetch()
+    except Exception as e:
+        stale = cache.get(cache_key)
+        if stale is None:
+            raise
+        logger.warning(f"[Fallback] Serving stale value for '{cache_key}': {e}")
+        return stale, True
+    cache.set(cache_key, value, timeout)
+    return value, False
+
+
+async def awith_stale_fallback(cache_key, fetch, timeout=STALE_SECONDS):
+    """with_stale_fallback() for async code: `fetch` is a coroutine function."""
+    try:
+        value = await fetch()
+    except Exception as e:
+        stale = await cache.aget(cache_key)
+        if stale is None:
+            raise
+        logger.warning(f"[Fallback] Serving stale value for '{cache_key}': {e}")
+        return stale, True
+    await cache.aset(cache_key, value, timeout)
+    return value, False
@@ -0,0 +1,300 @@
+# apps/roadmaps.py
+
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.db.models import Count
+from django.template.loader import get_template
+
+from .llm import acomplete, complete
+from .models import Career, CareerRoadmap
+
+logger = logging.getLogger(__name__)
+
+
+ROADMAP_SYSTEM_PROMPT = (
+    "You are a helpful career planning assistant. The user wants a step-by-step roadmap for a career. "
+    "You MUST respond with ONLY a valid JSON object. Do not include any text or markdown before or after the JSON. "
+    "The JSON object should have a single key 'roadmap' which is an array of steps. "
+    "Each step object in the array should have three keys: 'title' (a short title like 'High School' or 'Residency'), "
+    "'duration' (a string like '4 Years' or '3-7 Years'), and 'description' (a detailed markdown-formatted string explaining the step). "
+    "Create between 4 and 8 logical steps for the roadmap. "
+    "If special needs or accommodations are mentioned, include specific resources, alternative pathways, and accessibility considerations in your recommendations."
+)
+
+ROADMAP_DELTA_SYSTEM_PROMPT = (
+    "You are a helpful career planning assistant. You will be given a general JSON roadmap for a career and a short list "
+    "of personal circumstances. Adapt the roadmap to those circumstances, changing only the steps that need to change. "
+    "You MUST respond with ONLY a valid JSON object in exactly the same shape as the one you were given: "
+    "a single key 'roadmap' holding an array of steps with 'title', 'duration' and 'description' keys. "
+    "Keep between 4 and 8 steps. If special needs or accommodations are mentioned, include specific resources, "
+    "alternative pathways, and accessibility considerations."
+)
+
+
+def customization_details(customization):
+    """Turns the customization form values into prompt bullet lines. Empty fields are skipped."""
+    customization = customization or {}
+    details = []
+
+    starting_age = str(customization.get('starting_age') or '').strip()
+    if starting_age:
+        details.append(f"Starting at age {starting_age}")
+
+    country = str(customization.get('country') or '').strip()
+    if country:
+        details.append(f"Country/Location: {country}")
+
+    special_needs = str(customization.get('special_needs') or '').strip()
+    if special_needs:
+        details.append(f"Special needs and accommodations: {special_needs}")
+
+    return details
+
+
+def customization_summary(customization):
+    """Short, user-facing labels for the 'Personalized Roadmap' banner."""
+    customization = customization or {}
+    summary = []
+    if str(customization.get('starting_age') or '').strip():
+        summary.append(f"Starting at age {customization['starting_age']}")
+    if str(customization.get('country') or '').strip():
+        summary.append(f"For {customization['country']}")
+    if str(customization.get('special_needs') or '').strip():
+        summary.append("With accessibility considerations")
+    return summary
+
+
+def build_roadmap_prompts(career, details, base_roadmap=None):
+    """
+    Returns the (system, user) prompt pair. When a base roadmap is available and the
+    user asked for customizations, the prompt is a delta on top of the base roadmap.
+    """
+    if base_roadmap is not None and details:
+        user_prompt = (
+            f"General roadmap for becoming a {career.name}:\n{json.dumps(base_roadmap)}\n\n"
+            "Please customize this roadmap considering the following:\n"
+            + "\n".join(f"- {detail}" for detail in details)
+        )
+        return ROADMAP_DELTA_SYSTEM_PROMPT, user_prompt
+
+    user_prompt = f"Generate a JSON roadmap for becoming a {career.name}."
+    if details:
+        user_prompt += "\n\nPlease customize this roadmap considering the following:\n" + "\n".join(
+            f"- {detail}" for detail in details)
+        user_prompt += "\n\nEnsure the roadmap accounts for these specific requirements and includes relevant resources, alternative pathways, and accommodations where applicable."
+    return ROADMAP_SYSTEM_PROMPT, user_prompt
+
+
+def _complete_roadmap(system_prompt, user_prompt):
+    response = complete(
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        temperature=0.7,  # Slightly higher for more creative accommodations
+        response_format={"type": "json_object"}
+    )
+    return json.loads(response.choices[0].message.content)
+
+
+async def _acomplete_roadmap(system_prompt, user_prompt):
+    response = await acomplete(
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        temperature=0.7,
+        response_format={"type": "json_object"}
+    )
+    return json.loads(response.choices[0].message.content)
+
+
+def generate_base_roadmap(career):
+    """
+    Generates the career-generic roadmap and saves it to the shared store,
+    replacing any previous version. Returns the roadmap data.
+    """
+    logger.info(f"[Roadmaps] Generating base roadmap for: {career.name}")
+    roadmap_data = _complete_roadmap(*build_roadmap_prompts(career, []))
+    _store_base_roadmap(career, roadmap_data)
+    return roadmap_data
+
+
+def _store_base_roadmap(career, roadmap_data):
+    CareerRoadmap.objects.update_or_create(career=career, defaults={'roadmap': roadmap_data})
+
+
+def get_stored_base_roadmap(career):
+    """Returns the stored base roadmap for a career, or None if it hasn't been generated yet."""
+    stored = CareerRoadmap.objects.filter(career=career).first()
+    return stored.roadmap if stored is not None else None
+
+
+def get_base_roadmap(career):
+    """Returns the stored base roadmap for a career, generating and storing it on a miss."""
+    stored = get_stored_base_roadmap(career)
+    if stored is not None:
+        return stored
+    return generate_base_roadmap(career)
+
+
+def get_roadmap(career, customization=None):
+    """
+    Returns roadmap data for a career.
+
+    Without customization this is the shared base roadmap, so every user after the first
+    gets it without a model call. With customization the base roadmap is sent along with
+    a short delta prompt, which is much cheaper than generating a plan from scratch.
+    """
+    base_roadmap = get_base_roadmap(career)
+    details = customization_details(customization)
+    if not details:
+        return base_roadmap
+    return _complete_roadmap(*build_roadmap_prompts(career, details, base_roadmap))
+
+
+async def aget_roadmap(career, customization=None):
+    """Async get_roadmap(), for the async views."""
+    details = customization_details(customization)
+    base_roadmap = await sync_to_async(get_stored_base_roadmap)(career)
+    if base_roadmap is None:
+        logger.info(f"[Roadmaps] Generating base roadmap for: {career.name}")
+        base_roadmap = await _acomplete_roadmap(*build_roadmap_prompts(career, []))
+        await sync_to_async(_store_base_roadmap)(career, base_roadmap)
+    if not details:
+        return base_roadmap
+    return await _acomplete_roadmap(*build_roadmap_prompts(career, details, base_roadmap))
+
+
+class RoadmapStreamParser:
+    """
+    Incremental parser for the roadmap JSON as it streams in from the model.
+
+    Feed it text chunks; each call returns the step objects of the top-level
+    `roadmap` array that were completed by that chunk. It only tracks string/escape
+    state and nesting depth, so it never re-scans text it has already seen.
+    """
+
+    def __init__(self):
+        self.steps = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_chars = []
+        self._last_key = None
+        self._in_roadmap = False
+        self._step_chars = None
+
+    def feed(self, chunk):
+        completed = []
+        for ch in chunk:
+            if self._step_chars is not None:
+                self._step_chars.append(ch)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_key = ''.join(self._string_chars)
+                elif self._depth == 1:
+                    self._string_chars.append(ch)
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_chars = []
+            elif ch in '{[':
+                self._depth += 1
+                if ch == '[' and self._depth == 2 and self._last_key == 'roadmap':
+                    self._in_roadmap = True
+                elif ch == '{' and self._in_roadmap and self._depth == 3:
+                    self._step_chars = ['{']
+            elif ch in '}]':
+                if ch == '}' and self._in_roadmap and self._depth == 3 and self._step_chars is not None:
+                    step = json.loads(''.join(self._step_chars))
+                    self._step_chars = None
+                    self.steps.append(step)
+                    completed.append(step)
+                elif ch == ']' and self._in_roadmap and self._depth == 2:
+                    self._in_roadmap = False
+                self._depth -= 1
+        return completed
+
+
+async def stream_roadmap_steps(career, customization=None, base_roadmap=None):
+    """
+    Async generator yielding roadmap steps as soon as each one is complete.
+
+    `base_roadmap` is the stored base roadmap (or None on a miss), looked up by the caller
+    beforehand. An uncustomized request with a stored base yields it without a model call;
+    a freshly streamed base roadmap is saved to the shared store once it finishes.
+    """
+    details = customization_details(customization)
+    if base_roadmap is not None and not details:
+        for step in base_roadmap.get('roadmap', []):
+            yield step
+        return
+
+    system_prompt, user_prompt = build_roadmap_prompts(career, details, base_roadmap)
+    parser = RoadmapStreamParser()
+    stream = await acomplete(
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        temperature=0.7,
+        response_format={"type": "json_object"},
+        stream=True
+    )
+    async for chunk in stream:
+        # Azure sends a leading chunk with no choices (content filter results)
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            for step in parser.feed(delta):
+                yield step
+
+    if not details:
+        await sync_to_async(_store_base_roadmap)(career, {'roadmap': parser.steps})
+
+
+def popular_careers(limit):
+    """The `limit` careers with the most action plans, which are the ones worth precomputing."""
+    return (
+        Career.objects.annotate(plan_count=Count('action_plans'))
+        .filter(plan_count__gt=0)
+        .order_by('-plan_count', 'name')[:limit]
+    )
+
+
+# ==============================================================================
+# RENDERING
+# ==============================================================================
+# Plans store the structured roadmap (steps + customization) in ActionPlan.roadmap_data.
+# HTML is produced from the compiled templates below, which Django's cached template
+# loader keeps in memory, so re-theming never needs another model call.
+
+def roadmap_storage(steps, customization=None):
+    """The structured value stored in ActionPlan.roadmap_data."""
+    return {'roadmap': list(steps), 'customization': customization or {}}
+
+
+def render_roadmap_html(roadmap_data):
+    """Renders stored roadmap data (see roadmap_storage) to the full roadmap HTML."""
+    roadmap_data = roadmap_data or {}
+    return get_template('plans/roadmap.html').render({
+        'steps': roadmap_data.get('roadmap', []),
+        'customization_summary': customization_summary(roadmap_data.get('customization')),
+    })
+
+
+def render_roadmap_step_html(number, step):
+    """Renders a single `roadmap-item` fragment, as pushed while streaming."""
+    return get_template('plans/roadmap_item.html').render({'number': number, 'step': step})
@@ -0,0 +1,209 @@
+# apps/search.py
+#
+# Full-text search over a user's career journeys: journey titles, folder names and
+# chat message bodies.
+#
+# - MySQL (production): InnoDB FULLTEXT indexes on the source columns, created in
+#   migration 0005. InnoDB maintains them as part of every write, so there is nothing
+#   to keep in sync from Python.
+# - SQLite (local): an FTS5 table, `apps_journey_search`, holding one row per title,
+#   folder name and message. It is kept in sync on write by the handlers in signals.py.
+# - Anything else, or queries made only of very short words that the full-text parsers
+#   ignore, falls back to a plain icontains search.
+
+import html
+import logging
+import re
+from collections import namedtuple
+
+from django.db import connection
+from django.db.models import Q
+from django.utils.safestring import mark_safe
+
+from .models import CareerJourney, ChatMessage, JourneyFolder
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'apps_journey_search'
+MIN_TERM_LENGTH = 3  # InnoDB's default innodb_ft_min_token_size
+MAX_HITS = 500
+SNIPPET_RADIUS = 60
+
+# Private-use markers the database wraps around matches; swapped for <mark> after escaping
+_HL_START, _HL_END = '\x02', '\x03'
+
+SearchHit = namedtuple('SearchHit', ['journey_id', 'score', 'snippet'])
+
+
+def search_terms(query):
+    """Splits a search box query into plain word terms, dropping full-text operator characters."""
+    return re.findall(r'\w+', query.lower())
+
+
+def search_journeys(user, query):
+    """
+    Returns the user's journeys matching `query` as a list of SearchHit, best match first.
+    Each journey appears once, with a highlighted snippet from its best-scoring match.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+
+    vendor = connection.vendor
+    if vendor in ('mysql', 'sqlite') and any(len(term) >= MIN_TERM_LENGTH for term in terms):
+        try:
+            rows = _mysql_hits(user, terms) if vendor == 'mysql' else _sqlite_hits(user, terms)
+            return _collapse_hits(rows, terms)
+        except Exception as e:
+            # e.g. the FTS table or indexes haven't been migrated yet
+            logger.error(f"[Search] Full-text search failed, falling back to icontains: {e}", exc_info=True)
+    return _fallback_hits(user, query, terms)
+
+
+def _journey_pk(value):
+    return CareerJourney._meta.pk.to_python(value)
+
+
+def _collapse_hits(rows, terms):
+    """Keeps the best row per journey (rows arrive best-first) and sums scores for ranking."""
+    best = {}
+    for journey_id, score, text in rows:
+        journey_id = _journey_pk(journey_id)
+        if journey_id in best:
+            best[journey_id] = best[journey_id]._replace(score=best[journey_id].score + score)
+        else:
+            best[journey_id] = SearchHit(journey_id, score, highlight(text, terms))
+    return sorted(best.values(), key=lambda hit: hit.score, reverse=True)
+
+
+def highlight(text, terms):
+    """
+    HTML-escapes a snippet and wraps matches in <mark>. Text that already carries
+    the database's match markers keeps them; otherwise the terms are matched here.
+    """
+    text = text or ''
+    if _HL_START not in text and terms:
+        pattern = re.compile(r'\b(' + '|'.join(re.escape(term) for term in terms) + r')', re.IGNORECASE)
+        text = pattern.sub(lambda m: f"{_HL_START}{m.group(0)}{_HL_END}", text)
+    escaped = html.escape(text)
+    return mark_safe(escaped.replace(_HL_START, '<mark>').replace(_HL_END, '</mark>'))
+
+
+def _mysql_hits(user, terms):
+    # Every term must match, as a prefix, like the old icontains search
+    long_terms = [term for term in terms if len(term) >= MIN_TERM_LENGTH]
+    against = ' '.join(f'+{term}*' for term in long_terms)
+    first_term = long_terms[0]
+    journeys = CareerJourney._meta.db_table
+    folders = JourneyFolder._meta.db_table
+    chat_messages = ChatMessage._meta.db_table
+
+    sql = f"""
+        SELECT j.id, MATCH(j.title) AGAINST (%s IN BOOLEAN MODE) AS score, j.title
+          FROM {journeys} j
+         WHERE j.user_id = %s AND MATCH(j.title) AGAINST (%s IN BOOLEAN MODE)
+        UNION ALL
+        SELECT j.id, MATCH(f.name) AGAINST (%s IN BOOLEAN MODE) AS score, f.name
+          FROM {folders} f
+          JOIN {journeys} j ON j.folder_id = f.id
+         WHERE f.user_id = %s AND MATCH(f.name) AGAINST (%s IN BOOLEAN MODE)
+        UNION ALL
+        SELECT m.journey_id, MATCH(m.message) AGAINST (%s IN BOOLEAN MODE) AS score,
+               SUBSTRING(m.message, GREATEST(LOCATE(%s, m.message) - {SNIPPET_RADIUS}, 1), {SNIPPET_RADIUS * 3})
+          FROM {chat_messages} m
+          JOIN {journeys} j ON j.id = m.journey_id
+         WHERE j.user_id = %s AND MATCH(m.message) AGAINST (%s IN BOOLEAN MODE)
+        ORDER BY score DESC
+        LIMIT {MAX_HITS}
+    """
+    params = [against, user.id, against, against, user.id, against, against, first_term, user.id, against]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _sqlite_hits(user, terms):
+    match = ' '.join(f'"{term}"*' for term in terms)
+    journeys = CareerJourney._meta.db_table
+
+    # bm25() is lower-is-better, so it is negated to match MySQL's higher-is-better score
+    sql = f"""
+        SELECT COALESCE(j.id, s.journey_id), -bm25({FTS_TABLE}) AS score,
+               snippet({FTS_TABLE}, 0, char(2), char(3), '…', 16)
+          FROM {FTS_TABLE} s
+          LEFT JOIN {journeys} j ON s.kind = 'folder' AND j.folder_id = s.ref_id
+         WHERE {FTS_TABLE} MATCH %s AND s.user_id = %s
+           AND (s.kind != 'folder' OR j.id IS NOT NULL)
+         ORDER BY score DESC
+         LIMIT {MAX_HITS}
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [match, user.id])
+        return cursor.fetchall()
+
+
+def _fallback_hits(user, query, terms):
+    journeys = CareerJourney.objects.filter(user=user).filter(
+        Q(title__icontains=query) |
+        Q(messages__message__icontains=query) |
+        Q(folder__name__icontains=query)
+    ).distinct().values_list('id', 'title')
+    return [SearchHit(journey_id, 1.0, highlight(title, terms)) for journey_id, title in journeys]
+
+
+# ==============================================================================
+# SQLITE FTS5 INDEX MAINTENANCE
+# ==============================================================================
+
+def _uses_fts_table():
+    return connection.vendor == 'sqlite'
+
+
+def _index_row(kind, ref_id, journey_id, user_id, body):
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE kind = %s AND ref_id = %s", [kind, str(ref_id)])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (body, kind, ref_id, journey_id, user_id) VALUES (%s, %s, %s, %s, %s)",
+            [body, kind, str(ref_id), journey_id, user_id]
+        )
+
+
+def _unindex_row(kind, ref_id):
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE kind = %s AND ref_id = %s", [kind, str(ref_id)])
+
+
+def _db_id(instance):
+    # Stored exactly as the ORM stores the primary key, so the FTS rows join back to the source tables
+    return instance._meta.pk.get_db_prep_value(instance.pk, connection)
+
+
+def index_journey(journey):
+    if _uses_fts_table():
+        _index_row('journey', _db_id(journey), _db_id(journey), journey.user_id, journey.title)
+
+
+def unindex_journey(journey):
+    if _uses_fts_table():
+        _unindex_row('journey', _db_id(journey))
+
+
+def index_folder(folder):
+    if _uses_fts_table():
+        _index_row('folder', _db_id(folder), None, folder.user_id, folder.name)
+
+
+def unindex_folder(folder):
+    if _uses_fts_table():
+        _unindex_row('folder', _db_id(folder))
+
+
+def index_message(message):
+    if _uses_fts_table():
+        journey_id = CareerJourney._meta.pk.get_db_prep_value(message.journey_id, connection)
+        _index_row('message', message.pk, journey_id, message.journey.user_id, message.message)
+
+
+def unindex_message(message):
+    if _uses_fts_table():
+        _unindex_row('message', message.pk)
@@ -1,52 +1,67 @@
 # apps/services.py
 
 from django.conf import settings
+import logging
 import requests
-import os
+import itertools
+import struct
 import subprocess
-import tempfile
 import certifi
 
+from . import outbound
+from .audio import trim_silence
+from .transcoding import SAMPLE_RATE, TranscoderBusy, get_transcoder_pool
+
+logger = logging.getLogger(__name__)
+
+# Sizes in a WAV header written before the length is known (the usual streaming convention)
+WAV_UNKNOWN_SIZE = 0xFFFFFFFF
+
+
+def wav_stream_header(sample_rate=SAMPLE_RATE, channels=1, bits_per_sample=16):
+    """A 44-byte PCM WAV header for a stream whose length isn't known up front."""
+    byte_rate = sample_rate * channels * bits_per_sample // 8
+    block_align = channels * bits_per_sample // 8
+    return (
+        b'RIFF' + struct.pack('<I', WAV_UNKNOWN_SIZE) + b'WAVE'
+        + b'fmt ' + struct.pack('<IHHIIHH', 16, 1, channels, sample_rate, byte_rate, block_align, bits_per_sample)
+        + b'data' + struct.pack('<I', WAV_UNKNOWN_SIZE)
+    )
+
+
+def wav_upload_body(pcm_chunks):
+    """The WAV upload body as a generator, sent chunked while ffmpeg is still converting."""
+    yield wav_stream_header()
+    yield from pcm_chunks
+
+
 def transcribe_audio_rest(webm_audio_data: bytes) -> str:
     """
     Transcribes audio data from webm format to text using Azure Speech Service.
-    It uses ffmpeg to convert the audio to the required WAV format.
+    A warm ffmpeg from the transcoder pool converts the audio to 16kHz PCM through
+    pipes, silence is trimmed, and the WAV stream is uploaded as it is produced.
     """
-    temp_webm_path, temp_wav_path = None, None
+    pcm_chunks = speech_chunks = None
     try:
-        # Create a temporary file to store the received webm audio
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.webm') as temp_webm:
-            temp_webm.write(webm_audio_data)
-            temp_webm_path = temp_webm.name
-
-        # Define the path for the output wav file
-        temp_wav_path = temp_webm_path + '.wav'
-
-        # Use ffmpeg to convert webm to wav (16kHz, 16-bit PCM, mono)
-        command = [
-            'ffmpeg',
-            '-i', temp_webm_path,
-            '-acodec', 'pcm_s16le',
-            '-ar', '16000',
-            '-ac', '1',
-            temp_wav_path
-        ]
-        print(f"--- Running ffmpeg command: {' '.join(command)} ---")
-        subprocess.run(command, check=True, capture_output=True)
-
-        # Read the converted wav file data
-        with open(temp_wav_path, 'rb') as wav_file:
-            wav_audio_data = wav_file.read()
+        pcm_chunks = get_transcoder_pool().convert(webm_audio_data)
+        speech_chunks = trim_silence(pcm_chunks)
+        # Wait for the first speech before opening the upload; this also claims a transcoder,
+        # so a saturated pool fails fast, and a silence-only clip never reaches Azure
+        first_chunk = next(speech_chunks, None)
+        if first_chunk is None:
+            logger.info("[Transcribe] No speech detected in clip; skipping transcription")
+            return ""
 
         # Prepare the request to Azure Speech to Text API
         url = f"https://{settings.AZURE_SPEECH_REGION}.stt.speech.microsoft.com/speech/recognition/conversation/cognitiveservices/v1?language=en-US"
         headers = {
             'Ocp-Apim-Subscription-Key': settings.AZURE_SPEECH_KEY,
-            'Content-Type': 'audio/wav; codecs=audio/pcm; samplerate=16000'
+            'Content-Type': f'audio/wav; codecs=audio/pcm; samplerate={SAMPLE_RATE}'
         }
 
-        # Send the audio data for transcription with a 15-second timeout
-        response = requests.post(url, headers=headers, data=wav_audio_data, verify=certifi.where(), timeout=15)
+        # A generator body is sent with chunked transfer encoding, with a 15-second timeout
+        response = outbound.post(url, headers=headers, data=wav_upload_body(itertools.chain([first_chunk], speech_chunks)),
+                                 verify=certifi.where(), timeout=15)
         response.raise_for_status()
         result = response.json()
 
@@ -59,6 +74,9 @@ def transcribe_audio_rest(webm_audio_data: bytes) -> str:
             print(f"--- Azure Speech recognition failed: {result.get('RecognitionStatus')} ---")
             return ""
 
+    except TranscoderBusy as e:
+        logger.warning(f"[Transcribe] Transcoder pool saturated: {e}")
+        return "The audio service is busy right now. Please try again in a moment."
     except FileNotFoundError:
         print("!!! FATAL ERROR: `ffmpeg` is not installed or not in your system's PATH. !!!")
         return "Server configuration error: ffmpeg is missing."
@@ -72,8 +90,7 @@ def transcribe_audio_rest(webm_audio_data: bytes) -> str:
         print(f"!!! An unexpected error occurred in transcribe_audio_rest: {e} !!!")
         return "An unexpected server error occurred."
     finally:
-        # Clean up the temporary files
-        if temp_webm_path and os.path.exists(temp_webm_path):
-            os.remove(temp_webm_path)
-        if temp_wav_path and os.path.exists(temp_wav_path):
-            os.remove(temp_wav_path)
+        # Hands the transcoder slot back even if the upload failed part-way
+        for chunks in (speech_chunks, pcm_chunks):
+            if chunks is not None:
+                chunks.close()
@@ -0,0 +1,61 @@
+# apps/signals.py
+
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import search
+from .models import CareerJourney, ChatMessage, JourneyFolder
+
+LAST_MESSAGE_PREVIEW_LENGTH = 255
+
+
+# --- Journey counters ---
+
+@receiver(post_save, sender=ChatMessage)
+def update_journey_counters(sender, instance, created, **kwargs):
+    """
+    Bumps the journey's message count, last-activity time and preview in a single
+    UPDATE. The F() expression makes concurrent messages add up correctly, and it
+    replaces the extra journey.save() that used to bump updated_at.
+    """
+    if not created:
+        return
+    CareerJourney.objects.filter(pk=instance.journey_id).update(
+        message_count=F('message_count') + 1,
+        last_message_at=instance.timestamp,
+        last_message_preview=instance.message[:LAST_MESSAGE_PREVIEW_LENGTH],
+        updated_at=instance.timestamp,
+    )
+
+
+# --- Full-text search index (see apps/search.py) ---
+
+@receiver(post_save, sender=CareerJourney)
+def index_journey_on_save(sender, instance, **kwargs):
+    search.index_journey(instance)
+
+
+@receiver(post_delete, sender=CareerJourney)
+def unindex_journey_on_delete(sender, instance, **kwargs):
+    search.unindex_journey(instance)
+
+
+@receiver(post_save, sender=JourneyFolder)
+def index_folder_on_save(sender, instance, **kwargs):
+    search.index_folder(instance)
+
+
+@receiver(post_delete, sender=JourneyFolder)
+def unindex_folder_on_delete(sender, instance, **kwargs):
+    search.unindex_folder(instance)
+
+
+@receiver(post_save, sender=ChatMessage)
+def index_message_on_save(sender, instance, **kwargs):
+    search.index_message(instance)
+
+
+@receiver(post_delete, sender=ChatMessage)
+def unindex_message_on_delete(sender, instance, **kwargs):
+    search.unindex_message(instance)
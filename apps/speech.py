@@ -0,0 +1,244 @@
+# apps/speech.py
+#
+# Streaming speech recognition for the interview WebSocket. The consumer pushes 16 kHz
+# 16-bit mono PCM into a recognizer as the browser sends it; partial hypotheses come
+# back on `recognizer.events` while the user is still talking, and finish() returns the
+# final transcript as soon as the audio stream is closed.
+#
+# Backends, selected with settings.INTERVIEW_STT_BACKEND:
+#   'azure' - Azure Speech SDK continuous recognition on a PushAudioInputStream
+#   'local' - scripted stand-in for tests and offline development
+# or '' (the default) to keep recognition in the browser SDK.
+#
+# The Azure Speech SDK is a native library, so it is only imported once an Azure
+# recognizer starts; views.py imports this module for the token cache alone.
+
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from . import outbound
+from .transcoding import SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+FINAL_RESULT_TIMEOUT = 10  # seconds to wait for the last phrase after the audio ends
+
+
+class StreamingRecognizer(ABC):
+    """
+    Base class for streaming recognizers. Partial transcripts are put on `events` as
+    ('partial', text) tuples; they always hold the whole utterance so far.
+    """
+
+    def __init__(self):
+        self.events = asyncio.Queue()
+        self._loop = asyncio.get_running_loop()
+
+    def _emit_partial(self, text):
+        self.events.put_nowait(('partial', text))
+
+    async def start(self):
+        pass
+
+    @abstractmethod
+    async def push(self, pcm):
+        """Feeds a chunk of 16 kHz 16-bit mono PCM to the recognizer."""
+
+    @abstractmethod
+    async def finish(self):
+        """Ends the audio stream and returns the final transcript."""
+
+    async def close(self):
+        """Abandons the utterance (e.g. the socket went away)."""
+        pass
+
+
+class AzureStreamingRecognizer(StreamingRecognizer):
+
+    async def start(self):
+        import azure.cognitiveservices.speech as speechsdk
+        self._sdk = speechsdk
+        self._phrases = []
+        self._stopped = asyncio.Event()
+
+        stream_format = speechsdk.audio.AudioStreamFormat(samples_per_second=SAMPLE_RATE, bits_per_sample=16, channels=1)
+        self._stream = speechsdk.audio.PushAudioInputStream(stream_format=stream_format)
+        speech_config = speechsdk.SpeechConfig(subscription=settings.AZURE_SPEECH_KEY, region=settings.AZURE_SPEECH_REGION)
+        speech_config.speech_recognition_language = "en-US"
+        self._recognizer = speechsdk.SpeechRecognizer(
+            speech_config=speech_config,
+            audio_config=speechsdk.audio.AudioConfig(stream=self._stream),
+        )
+
+        # SDK callbacks arrive on SDK threads; hand everything over to the event loop
+        def on_loop(handler):
+            return lambda evt: self._loop.call_soon_threadsafe(handler, evt)
+
+        self._recognizer.recognizing.connect(on_loop(self._on_recognizing))
+        self._recognizer.recognized.connect(on_loop(self._on_recognized))
+        self._recognizer.canceled.connect(on_loop(self._on_stopped))
+        self._recognizer.session_stopped.connect(on_loop(self._on_stopped))
+
+        await sync_to_async(lambda: self._recognizer.start_continuous_recognition_async().get(),
+                            thread_sensitive=False)()
+
+    def _on_recognizing(self, evt):
+        self._emit_partial(' '.join(self._phrases + [evt.result.text]))
+
+    def _on_recognized(self, evt):
+        if evt.result.reason == self._sdk.ResultReason.RecognizedSpeech and evt.result.text:
+            self._phrases.append(evt.result.text)
+            self._emit_partial(' '.join(self._phrases))
+
+    def _on_stopped(self, evt):
+        canceled = isinstance(evt, self._sdk.SpeechRecognitionCanceledEventArgs)
+        if canceled and evt.reason == self._sdk.CancellationReason.Error:
+            logger.error(f"[STT] Azure recognition canceled: {evt.error_details}")
+        self._stopped.set()
+
+    async def push(self, pcm):
+        # Buffered by the SDK, so this never blocks the event loop on the network
+        self._stream.write(pcm)
+
+    async def finish(self):
+        # Closing the stream makes Azure finalize the last phrase and then end the session
+        self._stream.close()
+        try:
+            await asyncio.wait_for(self._stopped.wait(), FINAL_RESULT_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("[STT] Timed out waiting for Azure to finish the utterance.")
+        await self._stop()
+        return ' '.join(self._phrases)
+
+    async def close(self):
+        self._stream.close()
+        await self._stop()
+
+    async def _stop(self):
+        await sync_to_async(lambda: self._recognizer.stop_continuous_recognition_async().get(),
+                            thread_sensitive=False)()
+
+
+class LocalStubRecognizer(StreamingRecognizer):
+    """
+    Deterministic stand-in: "recognizes" a scripted transcript one word per half second
+    of audio received, and returns the whole script as the final transcript.
+    """
+
+    BYTES_PER_WORD = SAMPLE_RATE * 2 // 2
+
+    def __init__(self, transcript=None):
+        super().__init__()
+        self._words = (transcript or settings.SPEECH_STUB_TRANSCRIPT).split()
+        self._received = 0
+        self._shown = 0
+
+    async def push(self, pcm):
+        self._received += len(pcm)
+        words = min(len(self._words), self._received // self.BYTES_PER_WORD)
+        if words > self._shown:
+            self._shown = words
+            self._emit_partial(' '.join(self._words[:words]))
+
+    async def finish(self):
+        return ' '.join(self._words) if self._received else ''
+
+
+STREAMING_RECOGNIZERS = {
+    'azure': AzureStreamingRecognizer,
+    'local': LocalStubRecognizer,
+}
+
+
+def streaming_recognition_enabled():
+    return bool(getattr(settings, 'INTERVIEW_STT_BACKEND', ''))
+
+
+def create_recognizer(backend=None):
+    """Creates a recognizer for one utterance. Must be called from the event loop."""
+    backend = backend or settings.INTERVIEW_STT_BACKEND
+    try:
+        return STREAMING_RECOGNIZERS[backend]()
+    except KeyError:
+        raise ValueError(f"Unknown INTERVIEW_STT_BACKEND '{backend}'. Choose from: {', '.join(STREAMING_RECOGNIZERS)}")
+
+
+# ==============================================================================
+# AUTHORIZATION TOKENS FOR THE BROWSER SDK
+# ==============================================================================
+# Azure speech tokens are valid for 10 minutes. One token per region is kept in the
+# shared cache and refreshed ahead of expiry by whichever caller first wins the
+# refresh lock; everyone else keeps getting the current, still-valid token.
+
+TOKEN_CACHE_SECONDS = 9 * 60     # stop handing a token out a minute before Azure expires it
+TOKEN_REFRESH_AFTER = 7 * 60     # the first caller after this refreshes the token
+TOKEN_LOCK_SECONDS = 10
+TOKEN_WAIT_SECONDS = 5           # how long a caller waits on someone else's first fetch
+TOKEN_REQUEST_TIMEOUT = 5
+
+
+def _fetch_speech_token(region):
+    response = outbound.post(
+        f"https://{region}.api.cognitive.microsoft.com/sts/v1.0/issueToken",
+        headers={
+            'Ocp-Apim-Subscription-Key': settings.AZURE_SPEECH_KEY,
+            'Content-Type': 'application/x-www-form-urlencoded'
+        },
+        timeout=TOKEN_REQUEST_TIMEOUT,
+    )
+    response.raise_for_status()
+    return response.text
+
+
+def _refresh_speech_token(region, cache_key):
+    token = _fetch_speech_token(region)
+    cache.set(cache_key, {'token': token, 'fetched_at': time.time()}, TOKEN_CACHE_SECONDS)
+    logger.info(f"[SpeechToken] Fetched a new speech token for region '{region}'.")
+    return token
+
+
+def get_speech_token(region=None):
+    """
+    Returns a valid Azure Speech authorization token for `region`, shared by all workers.
+    Raises requests.exceptions.RequestException if a needed fetch fails.
+    """
+    region = region or settings.AZURE_SPEECH_REGION
+    cache_key = f"speech:token:{region}"
+    lock_key = f"{cache_key}:refresh"
+
+    cached = cache.get(cache_key)
+    if cached and time.time() - cached['fetched_at'] < TOKEN_REFRESH_AFTER:
+        return cached['token']
+
+    # Stale or missing: exactly one caller refreshes (cache.add is atomic on a shared cache)
+    if cache.add(lock_key, True, TOKEN_LOCK_SECONDS):
+        try:
+            return _refresh_speech_token(region, cache_key)
+        except requests.exceptions.RequestException:
+            if cached:
+                logger.warning(f"[SpeechToken] Refresh failed for '{region}'; serving the current token.", exc_info=True)
+                return cached['token']
+            raise
+        finally:
+            cache.delete(lock_key)
+
+    if cached:
+        # Someone else is refreshing, and this token is still good for a couple of minutes
+        return cached['token']
+
+    deadline = time.monotonic() + TOKEN_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(0.1)
+        cached = cache.get(cache_key)
+        if cached:
+            return cached['token']
+
+    logger.warning(f"[SpeechToken] Timed out waiting on another worker's fetch for '{region}'; fetching directly.")
+    return _refresh_speech_token(region, cache_key)
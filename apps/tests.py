@@ -1,3 +1,1118 @@
-from django.test import TestCase
+import io
+import asyncio
+import json
+import re
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import requests
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.test import AsyncClient, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import path, reverse
+from django.utils import timezone
+
+from .admission import concurrency_limit
+from .async_views import aget_object_or_404, async_csrf_exempt, async_login_required, async_require_POST
+from .audio import FRAME_MS, MAX_PAUSE_MS, PADDING_MS, VoiceActivityTrimmer, trim_silence
+from .idempotency import idempotent
+from .llm import Deployment, DeploymentPool
+
+from .models import (
+    ActionPlan, Career, CareerJourney, ChatMessage, InterviewAnalysisPoint, InterviewPresence, InterviewSession,
+    InterviewTurn, JourneyFolder, Opportunity,
+)
+from .presence import get_presence_summary, record_frame
+from .quota import HIGH, LOW, NORMAL, LocalTokenBucket, QuotaExceeded
+from .resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen, with_stale_fallback
+from .roadmaps import RoadmapStreamParser
+from .speech import TOKEN_REFRESH_AFTER, get_speech_token
+from .transcoding import SAMPLE_RATE, TranscoderBusy, TranscoderPool
+from .views import CHAT_PAGE_SIZE, _encode_message_cursor, get_chat_message_page
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class QueryPlanTests(TestCase):
+    """
+    Runs EXPLAIN on the hot view queries and fails if one of them stops using an index,
+    i.e. falls back to a full table scan or to sorting its rows (filesort / temp b-tree).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        # Several users, so that filtering by user is selective enough for the planner to use the index
+        for u in range(4):
+            user = User.objects.create_user(username=f'plan-user-{u}', password='x')
+            folder = JourneyFolder.objects.create(user=user, name=f'Folder {u}')
+            journeys = CareerJourney.objects.bulk_create([
+                CareerJourney(user=user, folder=folder if j % 2 else None, title=f'Journey {j}')
+                for j in range(5)
+            ])
+            ChatMessage.objects.bulk_create([
+                ChatMessage(journey=journey, message=f'Message {m}', sender_type='user' if m % 2 else 'ai')
+                for journey in journeys for m in range(10)
+            ])
+
+            career = Career.objects.create(name=f'Plan Career {u}')
+            plan = ActionPlan.objects.create(user=user, career=career)
+            Opportunity.objects.bulk_create([
+                Opportunity(action_plan=plan, title=f'Opportunity {o}', description='-',
+                            source_url='https://example.com', is_tracked=o % 3 == 0)
+                for o in range(10)
+            ])
+
+            for s in range(5):
+                session = InterviewSession.objects.create(user=user, status='completed' if s % 2 else 'ongoing')
+                InterviewTurn.objects.bulk_create([
+                    InterviewTurn(session=session, speaker='user', text=f'Turn {t}') for t in range(5)
+                ])
+                InterviewAnalysisPoint.objects.bulk_create([
+                    InterviewAnalysisPoint(session=session, person_detected=True) for _ in range(5)
+                ])
+
+        if connection.vendor == 'mysql':
+            with connection.cursor() as cursor:
+                for model in (CareerJourney, ChatMessage, Opportunity, InterviewSession,
+                              InterviewTurn, InterviewAnalysisPoint):
+                    cursor.execute(f"ANALYZE TABLE {model._meta.db_table}")
+
+        cls.user = User.objects.get(username='plan-user-0')
+        cls.journey = CareerJourney.objects.filter(user=cls.user).first()
+        cls.plan = ActionPlan.objects.get(user=cls.user)
+        cls.session = InterviewSession.objects.filter(user=cls.user).first()
+
+    def query_plan_problems(self, queryset):
+        """Returns the EXPLAIN lines showing a full scan or a sort, for the current database backend."""
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            if connection.vendor == 'mysql':
+                cursor.execute(f"EXPLAIN {sql}", params)
+                columns = [col[0].lower() for col in cursor.description]
+                rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+                return [
+                    row for row in rows
+                    if row.get('type') == 'ALL' or 'filesort' in (row.get('extra') or '').lower()
+                ]
+            if connection.vendor == 'sqlite':
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+                details = [row[-1] for row in cursor.fetchall()]
+                return [
+                    detail for detail in details
+                    if re.match(r'SCAN (TABLE )?\w+', detail) or 'TEMP B-TREE' in detail
+                ]
+        self.skipTest(f"No query plan checks for the '{connection.vendor}' backend.")
+
+    def assertUsesIndex(self, queryset):
+        problems = self.query_plan_problems(queryset)
+        self.assertEqual(problems, [], f"Query is not fully indexed:\n{queryset.query}")
+
+    def test_chat_history(self):
+        self.assertUsesIndex(ChatMessage.objects.filter(journey=self.journey).order_by('timestamp'))
+
+    def test_chat_page(self):
+        self.assertUsesIndex(ChatMessage.objects.filter(journey=self.journey).order_by('-timestamp', '-id')[:31])
+
+    def test_unfoldered_journeys(self):
+        self.assertUsesIndex(
+            CareerJourney.objects.filter(user=self.user, folder__isnull=True).order_by('-updated_at')
+        )
+
+    def test_plan_opportunities(self):
+        self.assertUsesIndex(self.plan.opportunities.all())
+
+    def test_tracked_opportunities(self):
+        self.assertUsesIndex(self.plan.opportunities.filter(is_tracked=True).order_by())
+
+    def test_past_interviews(self):
+        self.assertUsesIndex(
+            InterviewSession.objects.filter(user=self.user, status='completed').order_by('-start_time')
+        )
+
+    def test_interview_turns(self):
+        self.assertUsesIndex(InterviewTurn.objects.filter(session=self.session).order_by('timestamp'))
+
+    def test_analysis_points(self):
+        self.assertUsesIndex(InterviewAnalysisPoint.objects.filter(session=self.session).order_by('timestamp'))
+
+
+class CareerResolveTests(TestCase):
+
+    def test_spacing_and_case_resolve_to_one_row(self):
+        career, created = Career.objects.resolve("  nurse ")
+        self.assertTrue(created)
+        self.assertEqual(career.name, "nurse")
+        for title in ("NURSE", "Nurse", "nurse", "  Nurse\t"):
+            with self.subTest(title=title):
+                self.assertEqual(Career.objects.resolve(title), (career, False))
+        self.assertEqual(Career.objects.filter(name_key="nurse").count(), 1)
+
+    def test_new_title_creates_one_career(self):
+        before = Career.objects.count()
+        career, created = Career.objects.resolve("Marine   Biologist")
+        self.assertTrue(created)
+        self.assertEqual((career.name, career.name_key), ("Marine Biologist", "marine biologist"))
+        self.assertEqual(Career.objects.count(), before + 1)
+
+    def test_save_keeps_the_key_in_step_with_the_name(self):
+        career = Career.objects.create(name="Data  Analyst", keywords="-")
+        self.assertEqual(career.name_key, "data analyst")
+        career.name = "Senior Data Analyst"
+        career.save()
+        self.assertEqual(Career.objects.get(pk=career.pk).name_key, "senior data analyst")
+
+
+class CareerMergeMigrationTests(TransactionTestCase):
+    """
+    Migration 0002 merges careers whose names differ only by case or spacing before
+    adding the unique name_key index. Runs it on data created at the 0001 schema.
+    """
+
+    migrate_from = [('apps', '0001_initial')]
+    migrate_to = [('apps', '0002_career_name_key')]
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_from)
+        old_apps = executor.loader.project_state(self.migrate_from).apps
+        Career = old_apps.get_model('apps', 'Career')
+        ActionPlan = old_apps.get_model('apps', 'ActionPlan')
+        Opportunity = old_apps.get_model('apps', 'Opportunity')
+        User = old_apps.get_model('auth', 'User')
+
+        self.both = User.objects.create(username='merge-both')
+        self.one = User.objects.create(username='merge-one')
+        self.keeper = Career.objects.create(name='Nurse', keywords='')
+        duplicate = Career.objects.create(name='  NURSE ', keywords='care, health')
+        Career.objects.create(name='Pilot', keywords='flying')
+
+        # `both` has a plan on each duplicate, which would collide on (user, career) if simply re-pointed
+        self.kept_plan = ActionPlan.objects.create(user=self.both, career=self.keeper)
+        merged_plan = ActionPlan.objects.create(user=self.both, career=duplicate, roadmap_content='<ol>steps</ol>')
+        self.moved_opportunity = Opportunity.objects.create(
+            action_plan=merged_plan, title='Clinic job', description='-', source_url='https://example.com')
+        self.moved_plan = ActionPlan.objects.create(user=self.one, career=duplicate, roadmap_content='<ol>mine</ol>')
+
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(self.migrate_to)
+        self.apps = executor.loader.project_state(self.migrate_to).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes('apps'))
+
+    def test_duplicates_are_merged_into_the_oldest_career(self):
+        Career = self.apps.get_model('apps', 'Career')
+        ActionPlan = self.apps.get_model('apps', 'ActionPlan')
+        Opportunity = self.apps.get_model('apps', 'Opportunity')
+
+        self.assertEqual(sorted(Career.objects.values_list('name_key', flat=True)), ['nurse', 'pilot'])
+        keeper = Career.objects.get(name_key='nurse')
+        self.assertEqual(keeper.pk, self.keeper.pk)
+        self.assertEqual(keeper.keywords, 'care, health')
+
+        # The plan without a collision is re-pointed; the colliding one is folded into the kept plan
+        self.assertEqual(ActionPlan.objects.get(pk=self.moved_plan.pk).career_id, keeper.pk)
+        kept = ActionPlan.objects.get(pk=self.kept_plan.pk)
+        self.assertEqual(kept.roadmap_content, '<ol>steps</ol>')
+        self.assertEqual(Opportunity.objects.get(pk=self.moved_opportunity.pk).action_plan_id, kept.pk)
+        self.assertEqual(ActionPlan.objects.filter(user_id=self.both.pk).count(), 1)
+        self.assertEqual(ActionPlan.objects.filter(career_id=keeper.pk).count(), 2)
+
+
+class ChatMessagePaginationTests(TestCase):
+    """Keyset pagination over (timestamp, id), walked the way the chat page does it."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='paging-user', password='x')
+        cls.journey = CareerJourney.objects.create(user=cls.user, title='Paging')
+        messages = ChatMessage.objects.bulk_create([
+            ChatMessage(journey=cls.journey, message=f'Message {m}', sender_type='user' if m % 2 else 'ai')
+            for m in range(70)
+        ])
+        # Runs of seven messages share a timestamp, so both page boundaries (30 and 60
+        # messages back) fall inside a run and have to be split on id
+        start = timezone.now() - timedelta(hours=1)
+        for index, message in enumerate(messages):
+            ChatMessage.objects.filter(pk=message.pk).update(timestamp=start + timedelta(seconds=index // 7))
+        cls.expected = [m.pk for m in ChatMessage.objects.filter(journey=cls.journey).order_by('timestamp', 'id')]
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.url = reverse('apps:career_coach.messages', args=[self.journey.id])
+
+    def test_every_message_is_paged_once_in_order(self):
+        page, cursor = get_chat_message_page(self.journey)
+        pages = [[m.pk for m in page]]
+        while cursor:
+            response = self.client.get(self.url, {'before': cursor})
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            pages.append([m['id'] for m in data['messages']])
+            cursor = data['older_cursor']
+
+        self.assertEqual([len(p) for p in pages], [CHAT_PAGE_SIZE, CHAT_PAGE_SIZE, 10])
+        # Each page is chronological, and the pages go back in time without gaps or repeats
+        self.assertEqual([pk for p in reversed(pages) for pk in p], self.expected)
+
+    def test_cursor_points_at_the_oldest_message_shown(self):
+        page, cursor = get_chat_message_page(self.journey)
+        self.assertEqual(page[-1].pk, self.expected[-1])
+        self.assertEqual(cursor, _encode_message_cursor(page[0]))
+
+    def test_last_page_has_no_cursor(self):
+        page, cursor = get_chat_message_page(self.journey, limit=70)
+        self.assertEqual(len(page), 70)
+        self.assertIsNone(cursor)
+
+    def test_malformed_cursor_is_rejected(self):
+        for cursor in ('garbage', 'not-a-date_5', '2024-01-01T00:00:00+00:00_x'):
+            with self.subTest(cursor=cursor):
+                with self.assertLogs('django.request', 'WARNING'):
+                    response = self.client.get(self.url, {'before': cursor})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['status'], 'error')
+
+
+class JourneySearchOrderTests(TransactionTestCase):
+    """
+    Search results are listed by relevance, not by the newest/oldest sort. A
+    TransactionTestCase, since InnoDB full-text indexes only see committed rows.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='search-user', password='x')
+        self.passing = CareerJourney.objects.create(user=self.user, title='Notes')
+        ChatMessage.objects.create(journey=self.passing, sender_type='user',
+                                   message='I once thought about nursing, among many other things I could do')
+        self.focused = CareerJourney.objects.create(user=self.user, title='Nursing nursing nursing')
+
+    def tearDown(self):
+        # The SQLite FTS5 table isn't a model, so the flush after this test won't empty it.
+        # Deleting through the ORM lets the post_delete handlers remove the indexed rows.
+        CareerJourney.objects.filter(user=self.user).delete()
+
+    def test_best_match_first(self):
+        # The weaker match is the most recently updated, so a date sort would list it first
+        CareerJourney.objects.filter(pk=self.passing.pk).update(updated_at=timezone.now())
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('apps:journeys.list'), {'q': 'nursing', 'sort': 'newest'})
+        self.assertEqual([j.pk for j in response.context['unfoldered_journeys']],
+                         [self.focused.pk, self.passing.pk])
+
+
+class RecordFrameTests(TransactionTestCase):
+    """
+    A TransactionTestCase, so each write commits on its own and foreign keys are checked
+    the way they are in production.
+    """
+
+    def setUp(self):
+        user = User.objects.create_user(username='presence-user', password='x')
+        self.session = InterviewSession.objects.create(user=user)
+
+    def test_frames_accumulate_in_one_row(self):
+        for detected in (True, True, False, True):
+            record_frame(self.session.id, detected)
+        summary = get_presence_summary(self.session.id)
+        self.assertEqual((summary.frames_total, summary.frames_present), (4, 3))
+        self.assertEqual(summary.runs, [(True, 2), (False, 1), (True, 1)])
+
+    def test_deleted_session_is_dropped(self):
+        session_id = self.session.id
+        self.session.delete()
+        # The UPDATE, the failed INSERT and one retried UPDATE; then it gives up
+        with self.assertLogs('apps.presence', 'WARNING'):
+            record_frame(session_id, True)
+        self.assertFalse(InterviewPresence.objects.filter(session_id=session_id).exists())
+
+
+class LocalTokenBucketTests(SimpleTestCase):
+    """The in-process token bucket, on a frozen clock. 600 tokens per minute refill at 10 a second."""
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('apps.quota.time.monotonic', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.bucket = LocalTokenBucket('test', 600)
+
+    def test_takes_while_above_reserve(self):
+        self.assertEqual(self.bucket.take(400, reserve=180), (True, 0.0))
+        self.assertEqual(self.bucket.take(30, reserve=180), (False, 1.0))
+
+    def test_wait_is_time_to_refill_the_shortfall(self):
+        self.bucket.take(600)
+        self.assertEqual(self.bucket.take(100), (False, 10.0))
+        self.now += 4
+        self.assertEqual(self.bucket.take(100), (False, 6.0))
+        self.now += 6
+        self.assertEqual(self.bucket.take(100), (True, 0.0))
+
+    def test_refill_is_capped_at_capacity(self):
+        self.now += 3600
+        self.assertEqual(self.bucket.take(601), (False, 0.1))
+
+    def test_priority_reserves(self):
+        # Low-priority work must leave 30% of the bucket, normal work 10%, high-priority none
+        self.assertEqual(self.bucket.acquire(420, LOW), 420)
+        with self.assertRaises(QuotaExceeded):
+            self.bucket.acquire(30, LOW)
+        self.assertEqual(self.bucket.acquire(120, NORMAL), 120)
+        with self.assertRaises(QuotaExceeded):
+            self.bucket.acquire(200, NORMAL)
+        self.assertEqual(self.bucket.acquire(60, HIGH), 60)
+
+    def test_acquire_waits_for_the_refill_within_its_budget(self):
+        self.bucket.take(600)
+        with mock.patch('apps.quota.time.sleep', side_effect=lambda seconds: setattr(self, 'now', self.now + seconds)):
+            self.assertEqual(self.bucket.acquire(50, HIGH), 50)
+        self.assertEqual(self.now, 1005.0)
+
+    def test_low_priority_is_shed_instead_of_waiting_long(self):
+        self.bucket.take(600)
+        with self.assertRaises(QuotaExceeded) as raised:
+            self.bucket.acquire(100, LOW)
+        # 100 tokens plus the 180 reserve, at 10 a second
+        self.assertEqual(raised.exception.retry_after, 28.0)
+
+    def test_settle_refunds_unused_tokens(self):
+        taken = self.bucket.acquire(500, HIGH)
+        self.bucket.settle(taken, 200)
+        self.assertEqual(self.bucket.take(400), (True, 0.0))
+
+    def test_oversized_call_takes_everything_above_the_reserve(self):
+        self.assertEqual(self.bucket.acquire(5000, NORMAL), 540)
+
+
+class RoadmapStreamParserTests(SimpleTestCase):
+
+    ROADMAP = {
+        'note': 'Ignore {this} [text], "quoted" too',
+        'roadmap': [
+            {'title': 'High School', 'duration': '4 Years', 'description': 'Take "AP" {biology} and [chemistry]\\'},
+            {'title': 'College', 'duration': '4 Years', 'description': 'Nested', 'extra': {'tips': ['a', {'b': 1}]}},
+            {'title': 'Residency', 'duration': '3-7 Years', 'description': 'Line one\nline two'},
+        ],
+        'other': [{'title': 'Not a step'}],
+    }
+
+    def test_steps_arrive_as_each_one_completes(self):
+        text = json.dumps(self.ROADMAP, indent=2)
+        parser = RoadmapStreamParser()
+        seen = []
+        for char in text:
+            for step in parser.feed(char):
+                # A step is complete exactly when its closing brace arrives
+                seen.append(step)
+                self.assertEqual(step, self.ROADMAP['roadmap'][len(seen) - 1])
+        self.assertEqual(seen, self.ROADMAP['roadmap'])
+        self.assertEqual(parser.steps, self.ROADMAP['roadmap'])
+
+    def test_chunk_boundaries_do_not_matter(self):
+        text = json.dumps(self.ROADMAP)
+        for size in (1, 2, 7, 64, len(text)):
+            parser = RoadmapStreamParser()
+            steps = []
+            for start in range(0, len(text), size):
+                steps.extend(parser.feed(text[start:start + size]))
+            self.assertEqual(steps, self.ROADMAP['roadmap'], f"chunk size {size}")
+
+    def test_incomplete_step_is_not_returned(self):
+        text = json.dumps(self.ROADMAP)
+        cut = text.index('"College"')
+        parser = RoadmapStreamParser()
+        self.assertEqual(parser.feed(text[:cut]), self.ROADMAP['roadmap'][:1])
+
+
+class TrimSilenceTests(SimpleTestCase):
+    """Voice activity trimming on synthetic 16 kHz PCM, built from whole 30 ms frames."""
+
+    FRAME_SAMPLES = SAMPLE_RATE * FRAME_MS // 1000
+
+    def silence(self, frames):
+        return np.zeros(frames * self.FRAME_SAMPLES, dtype='<i2')
+
+    def tone(self, frames):
+        t = np.arange(frames * self.FRAME_SAMPLES) / SAMPLE_RATE
+        return (3000 * np.sin(2 * np.pi * 440 * t)).astype('<i2')
+
+    def trim(self, *parts, chunk_bytes=1001):
+        pcm = np.concatenate(parts).tobytes()
+        # Odd-sized chunks, so frames and even samples straddle chunk boundaries
+        chunks = [pcm[i:i + chunk_bytes] for i in range(0, len(pcm), chunk_bytes)]
+        kept = b''.join(trim_silence(chunks))
+        return np.frombuffer(kept, dtype='<i2').reshape(-1, self.FRAME_SAMPLES)
+
+    def test_silence_is_trimmed_and_long_pauses_shortened(self):
+        frames = self.trim(self.silence(30), self.tone(20), self.silence(60), self.tone(20), self.silence(30))
+        voiced = [bool(np.abs(frame).max()) for frame in frames]
+
+        padding = PADDING_MS // FRAME_MS
+        pause = voiced.index(False, padding)
+        pause_frames = voiced.index(True, pause) - pause
+        self.assertEqual(voiced[:padding], [False] * padding)
+        self.assertEqual(voiced[padding:pause], [True] * 20)
+        self.assertLessEqual(pause_frames * FRAME_MS, MAX_PAUSE_MS)
+        self.assertGreater(pause_frames, 0)
+        self.assertEqual(voiced[pause + pause_frames:pause + pause_frames + 20], [True] * 20)
+        self.assertEqual(voiced[pause + pause_frames + 20:], [False] * padding)
+
+    def test_all_silence_yields_nothing(self):
+        self.assertEqual(list(trim_silence([self.silence(50).tobytes()])), [])
+        self.assertEqual(len(self.trim(self.silence(50), chunk_bytes=7)), 0)
+
+    def test_odd_and_empty_input_does_not_raise(self):
+        self.assertEqual(list(trim_silence([])), [])
+        self.assertEqual(list(trim_silence([b'', b'\x01', b'\x02\x03\x04'])), [])
+        trimmer = VoiceActivityTrimmer()
+        self.assertEqual(trimmer.process(b'\x01' * (trimmer.frame_bytes + 1)), b'')
+        self.assertEqual(trimmer.finish(), b'')
+
+
+class FakeProcess:
+    """Stands in for an ffmpeg Popen: echoes a fixed output, and can be created already exited."""
+
+    def __init__(self, output=b'pcm', returncode=None):
+        self.stdin = io.BytesIO()
+        self.stdout = io.BytesIO(output)
+        self.stderr = io.BytesIO()
+        self.returncode = returncode
+
+    def poll(self):
+        return self.returncode
+
+    def wait(self):
+        if self.returncode is None:
+            self.returncode = 0
+        return self.returncode
+
+    def kill(self):
+        self.returncode = -9
+
+
+class TranscoderPoolTests(SimpleTestCase):
+
+    def setUp(self):
+        patcher = mock.patch('apps.transcoding.subprocess.Popen', side_effect=lambda *args, **kwargs: FakeProcess())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_pool(self, **options):
+        pool = TranscoderPool(['ffmpeg'], **{'size': 1, 'max_waiting': 2, 'acquire_timeout': 5, **options})
+        # Background warm-ups must finish while Popen is still patched
+        self.addCleanup(lambda: self.wait_for(lambda: pool._warming == 0))
+        return pool
+
+    def wait_for(self, condition):
+        for _ in range(500):
+            if condition():
+                return
+            time.sleep(0.01)
+        self.fail("Condition not reached")
+
+    def test_waiter_beyond_max_waiting_is_turned_away(self):
+        pool = self.make_pool()
+        holder = pool.convert(b'clip')
+        next(holder)
+
+        results = []
+        waiters = [threading.Thread(target=lambda: results.append(b''.join(pool.convert(b'clip')))) for _ in range(2)]
+        for waiter in waiters:
+            waiter.start()
+        self.wait_for(lambda: pool._waiting == 2)
+
+        with self.assertRaisesMessage(TranscoderBusy, 'Too many'):
+            next(pool.convert(b'clip'))
+
+        holder.close()
+        for waiter in waiters:
+            waiter.join(5)
+        self.assertEqual(results, [b'pcm', b'pcm'])
+
+    def test_closing_early_frees_the_slot(self):
+        pool = self.make_pool(max_waiting=1, acquire_timeout=0.05)
+        first = pool.convert(b'clip')
+        next(first)
+        with self.assertRaisesMessage(TranscoderBusy, 'Timed out'):
+            next(pool.convert(b'clip'))
+
+        first.close()
+        self.assertEqual(b''.join(pool.convert(b'clip')), b'pcm')
+
+    def test_exited_process_is_not_reused(self):
+        pool = self.make_pool()
+        exited = FakeProcess(b'exited', returncode=1)
+        pool._idle.put(exited)
+        pool._idle.put(FakeProcess(b'warm'))
+
+        self.assertEqual(b''.join(pool.convert(b'clip')), b'warm')
+        self.wait_for(lambda: pool._warming == 0)
+        self.assertNotIn(exited, list(pool._idle.queue))
+        self.assertEqual(exited.stdin.getvalue(), b'')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SpeechTokenTests(SimpleTestCase):
+    """The shared speech token cache, with the call to Azure's issueToken endpoint mocked out."""
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch('apps.speech._fetch_speech_token', return_value='new-token')
+        self.fetch = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def cache_token(self, token, age):
+        cache.set('speech:token:testregion', {'token': token, 'fetched_at': time.time() - age})
+
+    def test_concurrent_callers_share_one_fetch(self):
+        fetching = threading.Event()
+        release = threading.Event()
+
+        def slow_fetch(region):
+            fetching.set()
+            release.wait(5)
+            return 'new-token'
+
+        self.fetch.side_effect = slow_fetch
+        results = []
+        callers = [threading.Thread(target=lambda: results.append(get_speech_token('testregion'))) for _ in range(5)]
+        with self.assertLogs('apps.speech', 'INFO'):
+            for caller in callers:
+                caller.start()
+            fetching.wait(5)
+            release.set()
+            for caller in callers:
+                caller.join(10)
+
+        self.assertEqual(self.fetch.call_count, 1)
+        self.assertEqual(results, ['new-token'] * 5)
+
+    def test_fresh_token_is_reused(self):
+        self.cache_token('old-token', age=60)
+        self.assertEqual(get_speech_token('testregion'), 'old-token')
+        self.fetch.assert_not_called()
+
+    def test_old_token_is_refreshed(self):
+        self.cache_token('old-token', age=TOKEN_REFRESH_AFTER + 1)
+        with self.assertLogs('apps.speech', 'INFO'):
+            self.assertEqual(get_speech_token('testregion'), 'new-token')
+        self.assertEqual(get_speech_token('testregion'), 'new-token')
+        self.fetch.assert_called_once_with('testregion')
+
+    def test_failed_refresh_serves_the_cached_token(self):
+        self.cache_token('old-token', age=TOKEN_REFRESH_AFTER + 1)
+        self.fetch.side_effect = requests.exceptions.ConnectionError('down')
+        with self.assertLogs('apps.speech', 'WARNING'):
+            self.assertEqual(get_speech_token('testregion'), 'old-token')
+        # The refresh lock was released, so the next caller tries again
+        self.fetch.side_effect = None
+        with self.assertLogs('apps.speech', 'INFO'):
+            self.assertEqual(get_speech_token('testregion'), 'new-token')
+
+    def test_failed_fetch_without_a_token_raises(self):
+        self.fetch.side_effect = requests.exceptions.ConnectionError('down')
+        with self.assertRaises(requests.exceptions.RequestException):
+            get_speech_token('testregion')
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    """A breaker judged on at least 4 calls, opening at 50% failures for 20 seconds, on a frozen clock."""
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('apps.resilience.time.monotonic', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker('test', window_seconds=30, min_calls=4, failure_rate=0.5, open_seconds=20)
+
+    def call(self, ok=True):
+        try:
+            with self.breaker.guard():
+                if not ok:
+                    raise ConnectionError('down')
+        except ConnectionError:
+            pass
+
+    def trip(self):
+        with self.assertLogs('apps.resilience', 'WARNING'):
+            for _ in range(4):
+                self.call(ok=False)
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_stays_closed_below_min_calls(self):
+        for _ in range(3):
+            self.call(ok=False)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_opens_at_the_failure_rate(self):
+        self.call()
+        self.call(ok=False)
+        self.call()
+        self.assertEqual(self.breaker.state, CLOSED)
+        with self.assertLogs('apps.resilience', 'WARNING'):
+            self.call(ok=False)
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_old_outcomes_leave_the_window(self):
+        for _ in range(3):
+            self.call(ok=False)
+        self.now += 31
+        self.call(ok=False)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_fails_fast_while_open(self):
+        self.trip()
+        self.now += 5
+        called = []
+        with self.assertRaises(CircuitOpen) as raised:
+            with self.breaker.guard():
+                called.append(True)
+        self.assertEqual(called, [])
+        self.assertEqual(raised.exception.retry_after, 15)
+        self.assertFalse(self.breaker.available())
+
+    def test_allows_exactly_one_half_open_probe(self):
+        self.trip()
+        self.now += 20
+        self.assertTrue(self.breaker.available())
+        with self.assertLogs('apps.resilience', 'INFO'):
+            with self.breaker.guard():
+                self.assertEqual(self.breaker.state, HALF_OPEN)
+                self.assertFalse(self.breaker.available())
+                with self.assertRaises(CircuitOpen):
+                    with self.breaker.guard():
+                        pass
+
+    def test_probe_success_closes(self):
+        self.trip()
+        self.now += 20
+        with self.assertLogs('apps.resilience', 'INFO'):
+            self.call()
+        self.assertEqual(self.breaker.state, CLOSED)
+        # The window starts over: earlier failures don't count against it
+        for _ in range(3):
+            self.call(ok=False)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_probe_failure_reopens(self):
+        self.trip()
+        self.now += 20
+        with self.assertLogs('apps.resilience', 'INFO'):
+            self.call(ok=False)
+        self.assertEqual(self.breaker.state, OPEN)
+        with self.assertRaises(CircuitOpen) as raised:
+            with self.breaker.guard():
+                pass
+        self.assertEqual(raised.exception.retry_after, 20)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class StaleFallbackTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def unavailable(self):
+        raise ConnectionError('down')
+
+    def test_success_is_remembered(self):
+        self.assertEqual(with_stale_fallback('test:stale', lambda: 'fresh'), ('fresh', False))
+        self.assertEqual(cache.get('test:stale'), 'fresh')
+
+    def test_failure_serves_the_remembered_value(self):
+        with_stale_fallback('test:stale', lambda: 'fresh')
+        with self.assertLogs('apps.resilience', 'WARNING'):
+            self.assertEqual(with_stale_fallback('test:stale', self.unavailable), ('fresh', True))
+
+    def test_open_breaker_serves_the_remembered_value(self):
+        breaker = CircuitBreaker('test-stale', min_calls=1)
+
+        def guarded():
+            with breaker.guard():
+                self.unavailable()
+
+        with_stale_fallback('test:stale', lambda: 'fresh')
+        with self.assertLogs('apps.resilience', 'WARNING'):
+            # The first failure opens the breaker; the second call is refused by it
+            self.assertEqual(with_stale_fallback('test:stale', guarded), ('fresh', True))
+            self.assertEqual(breaker.state, OPEN)
+            self.assertEqual(with_stale_fallback('test:stale', guarded), ('fresh', True))
+
+    def test_failure_without_a_remembered_value_raises(self):
+        with self.assertRaises(ConnectionError):
+            with_stale_fallback('test:stale', self.unavailable)
+
+
+def stub_deployment(name, ewma=None, create=None):
+    """A Deployment whose client calls `create` (sync or async), with a breaker of its own."""
+    deployment = Deployment(name, 'https://example.invalid', 'key', name)
+    deployment.breaker = CircuitBreaker(f'test:{name}', min_calls=1)
+    deployment.ewma = ewma
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    deployment.client = deployment.async_client = lambda: client
+    return deployment
+
+
+class DeploymentPoolTests(SimpleTestCase):
+
+    def open_breaker(self, deployment):
+        with self.assertLogs('apps.resilience', 'WARNING'), self.assertRaises(ConnectionError):
+            with deployment.breaker.guard():
+                raise ConnectionError('down')
+
+    def test_chooses_the_lowest_expected_latency(self):
+        fast, slow = stub_deployment('fast', ewma=0.5), stub_deployment('slow', ewma=1.0)
+        pool = DeploymentPool([slow, fast])
+        self.assertIs(pool.choose(), fast)
+        # Calls already in flight count against it: 0.5s with 2 in flight is slower than 1.0s idle
+        fast.inflight = 2
+        self.assertIs(pool.choose(), slow)
+
+    def test_unmeasured_deployment_is_tried_first(self):
+        measured, new = stub_deployment('measured', ewma=0.1), stub_deployment('new')
+        self.assertIs(DeploymentPool([measured, new]).choose(), new)
+
+    def test_open_breaker_is_skipped(self):
+        fast, slow = stub_deployment('fast', ewma=0.5), stub_deployment('slow', ewma=1.0)
+        self.open_breaker(fast)
+        pool = DeploymentPool([fast, slow])
+        self.assertIs(pool.choose(), slow)
+        self.assertIsNone(pool.choose(exclude=(slow,)))
+
+    def test_all_breakers_open_raises(self):
+        deployments = [stub_deployment('a', create=mock.Mock()), stub_deployment('b', create=mock.Mock())]
+        for deployment in deployments:
+            self.open_breaker(deployment)
+        with self.assertRaises(CircuitOpen):
+            DeploymentPool(deployments).complete(messages=[])
+        for deployment in deployments:
+            deployment.client().chat.completions.create.assert_not_called()
+
+    def hedged_pair(self, primary_create, backup_create, delay):
+        primary = stub_deployment('primary', ewma=0.1, create=primary_create)
+        backup = stub_deployment('backup', ewma=0.2, create=backup_create)
+        primary.hedge_delay = lambda: delay
+        pool = DeploymentPool([primary, backup], hedging=True)
+        self.addCleanup(lambda: pool._executor and pool._executor.shutdown(wait=False))
+        return pool
+
+    def test_fast_primary_is_not_hedged(self):
+        backup_create = mock.Mock(return_value='backup')
+        pool = self.hedged_pair(mock.Mock(return_value='primary'), backup_create, delay=5)
+        self.assertEqual(pool.complete(messages=[]), 'primary')
+        backup_create.assert_not_called()
+
+    def test_hedge_fires_after_the_delay_and_the_faster_answer_wins(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        hedged_at = []
+
+        def slow_primary(**kwargs):
+            release.wait(5)
+            return 'primary'
+
+        def backup(**kwargs):
+            hedged_at.append(time.monotonic())
+            return 'backup'
+
+        pool = self.hedged_pair(slow_primary, backup, delay=0.2)
+        started = time.monotonic()
+        with self.assertLogs('apps.llm', 'INFO'):
+            self.assertEqual(pool.complete(messages=[]), 'backup')
+        self.assertGreaterEqual(hedged_at[0] - started, 0.2)
+
+    async def test_async_hedge_cancels_the_loser(self):
+        cancelled = asyncio.Event()
+
+        async def slow_primary(**kwargs):
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            return 'primary'
+
+        async def backup(**kwargs):
+            return 'backup'
+
+        pool = self.hedged_pair(slow_primary, backup, delay=0.05)
+        with self.assertLogs('apps.llm', 'INFO'):
+            self.assertEqual(await pool.acomplete(messages=[]), 'backup')
+        await asyncio.wait_for(cancelled.wait(), 1)
+
+
+# ==============================================================================
+# VIEW DECORATORS
+# ==============================================================================
+# Small views wrapped in the decorators under test, served from this module's own
+# urlconf. Requests are anonymous unless a test signs in.
+
+
+@concurrency_limit('test-stream', per_user=1, per_endpoint=4, methods=('POST',))
+def limited_stream_view(request):
+    return StreamingHttpResponse(iter([b'first ', b'second']))
+
+
+@concurrency_limit('test-queue', per_user=2, per_endpoint=1)
+def queued_stream_view(request):
+    return StreamingHttpResponse(iter([b'first ', b'second']))
+
+
+view_calls = Counter()
+# Set by a test to hold idempotent_echo_view until it's released
+view_entered = threading.Event()
+view_release = threading.Event()
+
+
+@idempotent('test-echo')
+def idempotent_echo_view(request):
+    view_calls['echo'] += 1
+    view_entered.set()
+    view_release.wait(5)
+    data = json.loads(request.body or '{}')
+    return JsonResponse({'call': view_calls['echo']}, status=data.get('status', 200))
+
+
+@idempotent('test-stream')
+def idempotent_stream_view(request):
+    view_calls['stream'] += 1
+    return StreamingHttpResponse(iter([b'call ', str(view_calls['stream']).encode()]))
+
+
+@idempotent('test-async')
+async def idempotent_async_view(request):
+    view_calls['async'] += 1
+    return JsonResponse({'call': view_calls['async']})
+
+
+@async_login_required
+async def async_private_view(request):
+    return JsonResponse({'user': request.user.username})
+
+
+@async_csrf_exempt
+@async_require_POST
+async def async_post_view(request):
+    return JsonResponse({'ok': True})
+
+
+urlpatterns = [
+    path('limited/', limited_stream_view),
+    path('queued/', queued_stream_view),
+    path('echo/', idempotent_echo_view),
+    path('stream/', idempotent_stream_view),
+    path('async/', idempotent_async_view),
+    path('private/', async_private_view),
+    path('post-only/', async_post_view),
+]
+
+
+@override_settings(ROOT_URLCONF='apps.tests', CACHES=LOCMEM_CACHES)
+class ConcurrencyLimitTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_user_over_limit_gets_429(self):
+        running = self.client.post('/limited/')
+        self.assertEqual(running.status_code, 200)
+
+        with self.assertLogs('django.request', 'WARNING'):
+            busy = self.client.post('/limited/')
+        self.assertEqual(busy.status_code, 429)
+        self.assertGreaterEqual(int(busy['Retry-After']), 1)
+        self.assertEqual(busy.json()['status'], 'busy')
+        self.assertEqual(busy.json()['queue_position'], 1)
+        b''.join(running.streaming_content)
+
+    def test_slot_is_freed_when_the_stream_ends(self):
+        running = self.client.post('/limited/')
+        self.assertEqual(b''.join(running.streaming_content), b'first second')
+
+        after = self.client.post('/limited/')
+        self.assertEqual(after.status_code, 200)
+        b''.join(after.streaming_content)
+
+    def test_slot_is_freed_when_the_client_disconnects(self):
+        running = self.client.post('/limited/')
+        next(iter(running.streaming_content))
+        # What the server does when the client goes away mid-stream
+        running.close()
+
+        after = self.client.post('/limited/')
+        self.assertEqual(after.status_code, 200)
+        b''.join(after.streaming_content)
+
+    def test_other_methods_are_not_limited(self):
+        running = self.client.post('/limited/')
+        self.assertEqual(self.client.get('/limited/').status_code, 200)
+        b''.join(running.streaming_content)
+
+    @mock.patch('apps.admission.QUEUE_WAIT_SECONDS', 0.3)
+    def test_endpoint_over_limit_waits_then_gets_429(self):
+        running = self.client.post('/queued/')
+        with self.assertLogs('django.request', 'WARNING'):
+            busy = self.client.post('/queued/')
+        self.assertEqual(busy.status_code, 429)
+        self.assertIn('Retry-After', busy)
+        self.assertIn('busy', busy.json()['message'])
+        b''.join(running.streaming_content)
+
+
+@override_settings(ROOT_URLCONF='apps.tests', CACHES=LOCMEM_CACHES)
+class IdempotencyTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        view_calls.clear()
+        view_entered.clear()
+        view_release.set()
+
+    def post(self, url, body=None, key='key-1', client=None):
+        headers = {'Idempotency-Key': key} if key else {}
+        return (client or self.client).post(url, json.dumps(body or {}), content_type='application/json',
+                                            headers=headers)
+
+    def test_duplicate_is_replayed(self):
+        first = self.post('/echo/')
+        second = self.post('/echo/')
+        self.assertEqual(view_calls['echo'], 1)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['Content-Type'], 'application/json')
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertFalse(first.has_header('Idempotent-Replayed'))
+
+    def test_keys_are_independent(self):
+        self.post('/echo/', key='key-1')
+        self.post('/echo/', key='key-2')
+        self.assertEqual(view_calls['echo'], 2)
+
+    def test_requests_without_a_key_always_run(self):
+        self.post('/echo/', key=None)
+        self.post('/echo/', key=None)
+        self.assertEqual(view_calls['echo'], 2)
+
+    def test_key_reused_with_another_body_is_rejected(self):
+        self.post('/echo/', {'message': 'hello'})
+        with self.assertLogs('django.request', 'WARNING'):
+            mismatch = self.post('/echo/', {'message': 'something else'})
+        self.assertEqual(mismatch.status_code, 422)
+        self.assertEqual(view_calls['echo'], 1)
+
+    def test_retryable_failures_are_not_stored(self):
+        for status in (500, 503, 429):
+            with self.subTest(status=status):
+                cache.clear()
+                view_calls.clear()
+                # Django logs server errors and 429s; keep them out of the test output
+                with self.assertLogs('django.request', 'WARNING'):
+                    self.assertEqual(self.post('/echo/', {'status': status}).status_code, status)
+                    self.assertEqual(self.post('/echo/', {'status': status}).status_code, status)
+                self.assertEqual(view_calls['echo'], 2)
+
+    def test_client_errors_are_stored(self):
+        with self.assertLogs('django.request', 'WARNING'):
+            self.post('/echo/', {'status': 400})
+            replay = self.post('/echo/', {'status': 400})
+        self.assertEqual(replay.status_code, 400)
+        self.assertEqual(view_calls['echo'], 1)
+
+    def test_duplicate_waits_for_the_original(self):
+        view_release.clear()
+        responses = {}
+
+        def send(name):
+            responses[name] = self.post('/echo/', client=self.client_class())
+
+        original = threading.Thread(target=send, args=('original',))
+        original.start()
+        self.assertTrue(view_entered.wait(5))
+        duplicate = threading.Thread(target=send, args=('duplicate',))
+        duplicate.start()
+        duplicate.join(0.5)
+        self.assertTrue(duplicate.is_alive(), "the duplicate should wait while the original runs")
+
+        view_release.set()
+        original.join(5)
+        duplicate.join(5)
+        self.assertEqual(view_calls['echo'], 1)
+        self.assertEqual(responses['duplicate'].content, responses['original'].content)
+        self.assertEqual(responses['duplicate']['Idempotent-Replayed'], 'true')
+
+    def test_stream_is_stored_once_it_completes(self):
+        first = self.post('/stream/')
+        self.assertEqual(b''.join(first.streaming_content), b'call 1')
+        replay = self.post('/stream/')
+        self.assertEqual(replay.content, b'call 1')
+        self.assertEqual(view_calls['stream'], 1)
+
+    def test_interrupted_stream_is_released(self):
+        first = self.post('/stream/')
+        next(iter(first.streaming_content))
+        # What the server does when the client goes away mid-stream
+        first.close()
+
+        retry = self.post('/stream/')
+        self.assertEqual(b''.join(retry.streaming_content), b'call 2')
+        self.assertEqual(view_calls['stream'], 2)
+
+    async def test_async_view_is_replayed(self):
+        first = await self.async_client.post('/async/', '{}', content_type='application/json',
+                                             headers={'Idempotency-Key': 'key-1'})
+        second = await self.async_client.post('/async/', '{}', content_type='application/json',
+                                              headers={'Idempotency-Key': 'key-1'})
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(view_calls['async'], 1)
+
+
+@override_settings(ROOT_URLCONF='apps.tests', LOGIN_URL='/login/')
+class AsyncViewHelperTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='async-owner', password='x')
+        cls.other = User.objects.create_user(username='async-other', password='x')
+        cls.journey = CareerJourney.objects.create(user=cls.owner, title='Mine')
+
+    async def test_anonymous_user_is_sent_to_login(self):
+        response = await self.async_client.get('/private/?tab=2')
+        self.assertRedirects(response, '/login/?next=/private/%3Ftab%3D2', fetch_redirect_response=False)
+
+    async def test_signed_in_user_reaches_the_view(self):
+        await sync_to_async(self.async_client.force_login)(self.owner)
+        response = await self.async_client.get('/private/')
+        self.assertEqual(response.json(), {'user': 'async-owner'})
+
+    async def test_get_to_post_only_view_is_rejected(self):
+        with self.assertLogs('django.request', 'WARNING'):
+            response = await self.async_client.get('/post-only/')
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(response['Allow'], 'POST')
+
+    async def test_csrf_exempt_view_skips_the_token_check(self):
+        self.assertTrue(async_post_view.csrf_exempt)
+        self.assertTrue(asyncio.iscoroutinefunction(async_post_view))
+        response = await AsyncClient(enforce_csrf_checks=True).post('/post-only/')
+        self.assertEqual(response.json(), {'ok': True})
+
+    async def test_aget_object_or_404_is_scoped_to_the_lookup(self):
+        journey = await aget_object_or_404(CareerJourney, id=self.journey.id, user=self.owner)
+        self.assertEqual(journey.pk, self.journey.pk)
+        with self.assertRaises(Http404):
+            await aget_object_or_404(CareerJourney, id=self.journey.id, user=self.other)
+        with self.assertRaises(Http404):
+            await aget_object_or_404(CareerJourney.objects.filter(user=self.other), id=self.journey.id)
@@ -0,0 +1,158 @@
+# apps/transcoding.py
+#
+# A pool of warm ffmpeg processes for converting uploaded speech clips to PCM.
+#
+# ffmpeg handles one input per process, so the pool keeps processes already spawned
+# and blocked on stdin. A clip takes a warm process and a replacement is spawned in
+# the background, so the request never waits on fork/exec. The number of conversions
+# running at once is capped at the pool size, and only a bounded number of callers
+# may wait for a slot; beyond that, or after waiting too long, TranscoderBusy is raised.
+
+import logging
+import queue
+import subprocess
+import threading
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+PCM_CHUNK_BYTES = 32 * 1024
+
+FFMPEG_PCM_COMMAND = [
+    'ffmpeg', '-hide_banner', '-loglevel', 'error',
+    '-i', 'pipe:0',
+    '-f', 's16le', '-acodec', 'pcm_s16le', '-ar', str(SAMPLE_RATE), '-ac', '1',
+    'pipe:1',
+]
+
+
+class TranscoderBusy(Exception):
+    """Raised when every transcoder is busy and the wait queue is full or the wait timed out."""
+
+
+class TranscoderPool:
+
+    def __init__(self, command, size, max_waiting, acquire_timeout):
+        self.command = command
+        self.size = size
+        self.max_waiting = max_waiting
+        self.acquire_timeout = acquire_timeout
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._warming = 0
+
+    def _spawn(self):
+        return subprocess.Popen(self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def _warm_up(self):
+        """Tops the idle set back up to `size` processes from a background thread."""
+        with self._lock:
+            missing = self.size - self._idle.qsize() - self._warming
+            if missing <= 0:
+                return
+            self._warming += missing
+
+        def spawn_missing():
+            for _ in range(missing):
+                try:
+                    self._idle.put(self._spawn())
+                except OSError as e:
+                    logger.error(f"[Transcoder] Could not spawn ffmpeg: {e}")
+                finally:
+                    with self._lock:
+                        self._warming -= 1
+
+        threading.Thread(target=spawn_missing, daemon=True).start()
+
+    def _take_process(self):
+        while True:
+            try:
+                process = self._idle.get_nowait()
+            except queue.Empty:
+                # Pool still warming up (or ffmpeg kept failing); pay for this spawn inline
+                return self._spawn()
+            if process.poll() is None:
+                return process
+
+    def _acquire_slot(self):
+        with self._lock:
+            if self._waiting >= self.max_waiting:
+                raise TranscoderBusy("Too many audio clips are waiting for a transcoder.")
+            self._waiting += 1
+        try:
+            if not self._slots.acquire(timeout=self.acquire_timeout):
+                raise TranscoderBusy("Timed out waiting for a free transcoder.")
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    def convert(self, audio_data):
+        """
+        Converts an audio clip to 16kHz 16-bit mono PCM, yielding chunks as ffmpeg
+        produces them. Raises TranscoderBusy before the conversion starts when the
+        pool is saturated, and CalledProcessError at the end if ffmpeg failed.
+        """
+        self._acquire_slot()
+        try:
+            process = self._take_process()
+            self._warm_up()
+            yield from _stream_through(process, self.command, audio_data)
+        finally:
+            self._slots.release()
+
+
+def _stream_through(process, command, audio_data):
+    def feed_input():
+        # Written from a thread so a full stdout pipe can't deadlock against a full stdin pipe
+        try:
+            process.stdin.write(audio_data)
+            process.stdin.close()
+        except (BrokenPipeError, ValueError):
+            pass  # ffmpeg exited (or was killed) early; its exit status reports why
+
+    writer = threading.Thread(target=feed_input, daemon=True)
+    writer.start()
+    try:
+        while True:
+            chunk = process.stdout.read(PCM_CHUNK_BYTES)
+            if not chunk:
+                break
+            yield chunk
+        writer.join()
+        stderr = process.stderr.read()
+        if process.wait() != 0:
+            raise subprocess.CalledProcessError(process.returncode, command, stderr=stderr)
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        writer.join()
+        for stream in (process.stdin, process.stdout, process.stderr):
+            try:
+                stream.close()
+            except OSError:
+                pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_transcoder_pool():
+    """The process-wide TranscoderPool, created (and warmed) on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = TranscoderPool(
+                    FFMPEG_PCM_COMMAND,
+                    size=settings.TRANSCODER_POOL_SIZE,
+                    max_waiting=settings.TRANSCODER_MAX_WAITING,
+                    acquire_timeout=settings.TRANSCODER_ACQUIRE_TIMEOUT,
+                )
+                _pool._warm_up()
+    return _pool
@@ -3,7 +3,7 @@ from . import views  # ← ADD THIS LINE
 from .views import (
     # Journey & Folder Views
     journeys_list_view, create_journey_view, delete_journey_view,
-    career_coach_chat_view, rename_journey_view, create_folder_view,
+    career_coach_chat_view, chat_messages_page_view, rename_journey_view, create_folder_view,
     move_journey_to_folder, rename_folder_view, delete_folder_view,
     move_journey_drag_drop, reorder_folders_view,
 
@@ -61,6 +61,7 @@ urlpatterns = [
     path("journeys/delete/<uuid:journey_id>/", view=delete_journey_view, name="journeys.delete"),
     path("journeys/rename/<uuid:journey_id>/", view=rename_journey_view, name="journeys.rename"),
     path("career-coach/chat/<uuid:journey_id>/", view=career_coach_chat_view, name="career_coach.chat"),
+    path("career-coach/chat/<uuid:journey_id>/messages/", view=chat_messages_page_view, name="career_coach.messages"),
 
     # Folder Management URLs
     path("folders/new/", view=create_folder_view, name="folders.new"),
@@ -0,0 +1,221 @@
+# apps/vision.py
+
+import io
+import logging
+import threading
+from abc import ABC, abstractmethod
+
+import numpy as np
+from PIL import Image
+from azure.ai.vision.imageanalysis import ImageAnalysisClient
+from azure.ai.vision.imageanalysis.models import VisualFeatures
+from azure.core.credentials import AzureKeyCredential
+from django.conf import settings
+
+from .outbound import azure_transport
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_vision_client():
+    """
+    The process-wide ImageAnalysisClient. It is thread-safe, so one instance (and its
+    pooled HTTPS connections) is shared by every request and interview socket.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ImageAnalysisClient(
+                    endpoint=settings.AZURE_VISION_ENDPOINT,
+                    credential=AzureKeyCredential(settings.AZURE_VISION_KEY),
+                    transport=azure_transport(),
+                )
+    return _client
+
+
+def detect_person(image_data):
+    """Returns True if Azure Image Analysis finds at least one person in the image bytes."""
+    result = get_vision_client().analyze(
+        image_data=image_data,
+        visual_features=[VisualFeatures.PEOPLE],
+    )
+    return bool(result.people and len(result.people) > 0)
+
+
+# ==============================================================================
+# FRAME PREPROCESSING
+# ==============================================================================
+# People detection works fine on small images, so frames are downscaled before upload,
+# and a frame that looks the same as the last analyzed one reuses its verdict.
+
+ANALYSIS_MAX_SIDE = 512         # longest side sent to the vision API, in pixels
+ANALYSIS_JPEG_QUALITY = 80
+DUPLICATE_MAX_DISTANCE = 6      # dHash bits (of 64) that may differ for a frame to count as unchanged
+MAX_REUSED_VERDICTS = 5         # re-check with the API at least every N+1 frames regardless
+
+
+class PreparedFrame:
+    """A decoded, downscaled camera frame. The JPEG for upload is only encoded if a backend asks for it."""
+
+    def __init__(self, image, frame_hash):
+        self.image = image
+        self.hash = frame_hash
+        self._jpeg = None
+
+    @property
+    def jpeg(self):
+        if self._jpeg is None:
+            output = io.BytesIO()
+            self.image.save(output, format='JPEG', quality=ANALYSIS_JPEG_QUALITY)
+            self._jpeg = output.getvalue()
+        return self._jpeg
+
+
+def prepare_frame(image_data):
+    """Decodes a camera frame, downscales it to ANALYSIS_MAX_SIDE and computes its difference hash."""
+    with Image.open(io.BytesIO(image_data)) as source:
+        image = source.convert('RGB')
+    image.thumbnail((ANALYSIS_MAX_SIDE, ANALYSIS_MAX_SIDE))
+    return PreparedFrame(image, dhash(image))
+
+
+def dhash(image, hash_size=8):
+    """Difference hash: one bit per horizontally adjacent pixel pair of a tiny grayscale copy."""
+    small = image.convert('L').resize((hash_size + 1, hash_size), Image.BILINEAR)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def hash_distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+class FramePresenceAnalyzer:
+    """
+    Presence detection for one interview's stream of frames. Near-duplicate frames
+    reuse the previous verdict instead of calling the vision API again.
+
+    `state` is a plain dict so the HTTP endpoint can keep it in the cache between requests.
+    """
+
+    def __init__(self, state=None):
+        self.state = state or {'hash': None, 'verdict': None, 'reused': 0}
+
+    def analyze(self, image_data):
+        frame = prepare_frame(image_data)
+        last_hash = self.state['hash']
+        if (last_hash is not None
+                and self.state['reused'] < MAX_REUSED_VERDICTS
+                and hash_distance(frame.hash, last_hash) <= DUPLICATE_MAX_DISTANCE):
+            self.state['reused'] += 1
+            return self.state['verdict']
+
+        verdict = get_person_detector().detect(frame)
+        self.state = {'hash': frame.hash, 'verdict': verdict, 'reused': 0}
+        return verdict
+
+
+# ==============================================================================
+# PERSON DETECTORS
+# ==============================================================================
+# Selected with settings.CAMERA_PRESENCE_DETECTOR:
+#   'azure'  - Azure Image Analysis people detection (network call per frame)
+#   'local'  - CPU-only skin-region detector, a few milliseconds per frame
+#   'hybrid' - local detector, asking Azure only about frames it can't call either way
+
+class PersonDetector(ABC):
+    name = None
+
+    @abstractmethod
+    def detect(self, frame):
+        """Returns True if a person is visible in the PreparedFrame."""
+
+
+class AzurePersonDetector(PersonDetector):
+    name = 'azure'
+
+    def detect(self, frame):
+        return detect_person(frame.jpeg)
+
+
+class SkinRegionPersonDetector(PersonDetector):
+    """
+    Classical skin-colour detector. Pixels inside the YCbCr skin cluster (Chai & Ngan)
+    are counted in the central region of the frame, where a webcam user's face and
+    hands are. Lots of skin there means someone is present; almost none means nobody is.
+    """
+    name = 'local'
+
+    WORK_SIZE = 160               # frames are analyzed at this size (longest side)
+    CB_RANGE = (77, 127)
+    CR_RANGE = (133, 173)
+    PRESENT_FRACTION = 0.08       # central skin fraction at or above which someone is present
+    ABSENT_FRACTION = 0.01        # ... and at or below which nobody is
+    MAX_FRAME_FRACTION = 0.6      # more skin-coloured than this overall is most likely a wall
+
+    def classify(self, frame):
+        """Returns True/False, or None when the frame falls between the two thresholds."""
+        image = frame.image.copy()
+        image.thumbnail((self.WORK_SIZE, self.WORK_SIZE))
+        ycbcr = np.asarray(image.convert('YCbCr'), dtype=np.uint8)
+        cb, cr = ycbcr[..., 1], ycbcr[..., 2]
+        mask = ((cb >= self.CB_RANGE[0]) & (cb <= self.CB_RANGE[1])
+                & (cr >= self.CR_RANGE[0]) & (cr <= self.CR_RANGE[1]))
+
+        if mask.mean() > self.MAX_FRAME_FRACTION:
+            return None
+
+        height, width = mask.shape
+        central = mask[: int(height * 0.85), int(width * 0.2): int(width * 0.8)]
+        fraction = float(central.mean()) if central.size else 0.0
+        if fraction >= self.PRESENT_FRACTION:
+            return True
+        if fraction <= self.ABSENT_FRACTION:
+            return False
+        return None
+
+    def detect(self, frame):
+        return bool(self.classify(frame))
+
+
+class HybridPersonDetector(PersonDetector):
+    name = 'hybrid'
+
+    def __init__(self):
+        self.local = SkinRegionPersonDetector()
+        self.remote = AzurePersonDetector()
+
+    def detect(self, frame):
+        verdict = self.local.classify(frame)
+        if verdict is None:
+            return self.remote.detect(frame)
+        return verdict
+
+
+PERSON_DETECTORS = {
+    detector.name: detector
+    for detector in (AzurePersonDetector, SkinRegionPersonDetector, HybridPersonDetector)
+}
+
+_detectors = {}
+
+
+def get_person_detector(name=None):
+    """Returns the shared detector instance for `name`, defaulting to settings.CAMERA_PRESENCE_DETECTOR."""
+    name = name or getattr(settings, 'CAMERA_PRESENCE_DETECTOR', 'azure')
+    if name not in _detectors:
+        try:
+            _detectors[name] = PERSON_DETECTORS[name]()
+        except KeyError:
+            raise ValueError(f"Unknown CAMERA_PRESENCE_DETECTOR '{name}'. Choose from: {', '.join(PERSON_DETECTORS)}")
+    return _detectors[name]
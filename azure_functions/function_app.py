@@ -3,12 +3,23 @@ import logging
 import requests
 import json
 import os
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from urllib.parse import urlparse
 from datetime import datetime, timedelta
 from typing import List
 
 app = func.FunctionApp(http_auth_level=func.AuthLevel.FUNCTION)
 
+# One session per worker, so warm invocations reuse the keep-alive connections to RapidAPI.
+# Retries transient gateway errors and rate limits on these GETs, honouring Retry-After.
+http = requests.Session()
+http.mount("https://", HTTPAdapter(
+    pool_maxsize=10,
+    max_retries=Retry(total=2, backoff_factor=0.5, status_forcelist=(429, 502, 503, 504),
+                      respect_retry_after_header=True, raise_on_status=False),
+))
+
 
 def run_linkedin_search(query: str, headers: dict) -> List[dict]:
     """Uses the correct LinkedIn job search endpoint."""
@@ -37,7 +48,7 @@ def run_linkedin_search(query: str, headers: dict) -> List[dict]:
     logging.info(f"Headers: {headers_with_content_type}")
 
     try:
-        response = requests.get(url, headers=headers_with_content_type, params=querystring, timeout=15)
+        response = http.get(url, headers=headers_with_content_type, params=querystring, timeout=15)
         logging.info(f"Response status: {response.status_code}")
 
         if response.status_code != 200:
@@ -103,7 +114,7 @@ def run_bing_search(query: str, result_type: str, headers: dict) -> List[dict]:
     }
 
     try:
-        response = requests.get(url, headers=headers, params=querystring, timeout=15)
+        response = http.get(url, headers=headers, params=querystring, timeout=15)
         logging.info(f"Response status: {response.status_code}")
 
         if response.status_code != 200:
@@ -164,7 +175,7 @@ def run_instagram_scrape(headers: dict) -> List[dict]:
     logging.info(f"Headers: {headers}")
 
     try:
-        response = requests.get(url, headers=headers, params=querystring, timeout=20)
+        response = http.get(url, headers=headers, params=querystring, timeout=20)
         logging.info(f"Response status: {response.status_code}")
 
         if response.status_code != 200:
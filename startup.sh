@@ -26,6 +26,11 @@ fi
 # Set Python path (optional but good practice)
 export PYTHONPATH="$DEPLOYMENT_PATH:$PYTHONPATH"
 
+# Keep the shared base roadmaps for popular careers warm (refreshes every 6 hours).
+# Every instance starts one; a lock in the shared cache lets only one of them run each round.
+echo "Starting roadmap precompute scheduler..."
+python manage.py precompute_roadmaps --interval 21600 &
+
 # Start Daphne ASGI server
 echo "Starting Daphne server..."
 daphne -b 0.0.0.0 -p 8000 --access-log - --proxy-headers velzon.asgi:application
\ No newline at end of file
@@ -1,5 +1,6 @@
 # velzon/settings.py
 
+import json
 import os
 from pathlib import Path
 from django.contrib.messages import constants as messages
@@ -31,10 +32,20 @@ DatabaseWrapper.check_database_version_supported = lambda self: None
 AZURE_OPENAI_AGENT_ENDPOINT = os.getenv("AZURE_OPENAI_AGENT_ENDPOINT")
 AZURE_OPENAI_AGENT_KEY = os.getenv("AZURE_OPENAI_AGENT_KEY")
 AZURE_OPENAI_AGENT_DEPLOYMENT_NAME = os.getenv("AZURE_OPENAI_AGENT_DEPLOYMENT_NAME", "gpt-35-turbo")
+# The agent deployment's tokens-per-minute quota, enforced across workers (apps/quota.py); 0 = no limit
+AZURE_OPENAI_AGENT_TPM = int(os.getenv("AZURE_OPENAI_AGENT_TPM", "0"))
+# More deployments to spread completions across (apps/llm.py), as a JSON list of
+# {"name", "endpoint", "key", "deployment", "tpm"} objects; the agent deployment above is always in the pool
+AZURE_OPENAI_EXTRA_DEPLOYMENTS = json.loads(os.getenv("AZURE_OPENAI_EXTRA_DEPLOYMENTS", "[]"))
+# Send a duplicate completion to a second deployment when the first runs past its p95 latency
+LLM_HEDGING = os.getenv("LLM_HEDGING", "False").lower() == "true"
 AZURE_LANGUAGE_ENDPOINT = os.getenv("AZURE_LANGUAGE_ENDPOINT")
 AZURE_LANGUAGE_KEY = os.getenv("AZURE_LANGUAGE_KEY")
 AZURE_SPEECH_KEY = os.getenv("AZURE_SPEECH_KEY")
 AZURE_SPEECH_REGION = os.getenv("AZURE_SPEECH_REGION")
+# Interview speech recognition over the WebSocket: 'azure', 'local' (scripted stub), or '' for the browser SDK
+INTERVIEW_STT_BACKEND = os.getenv("INTERVIEW_STT_BACKEND", "")
+SPEECH_STUB_TRANSCRIPT = os.getenv("SPEECH_STUB_TRANSCRIPT", "I have three years of experience working in customer support.")
 TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
 TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
 TWILIO_WHATSAPP_NUMBER = os.getenv("TWILIO_WHATSAPP_NUMBER")
@@ -44,6 +55,12 @@ AZURE_FACE_API_KEY = os.getenv("AZURE_FACE_API_KEY")
 
 AZURE_VISION_ENDPOINT = os.getenv("AZURE_VISION_ENDPOINT")
 AZURE_VISION_KEY = os.getenv("AZURE_VISION_KEY")
+# Camera presence backend: 'azure', 'local' (CPU skin-region detector) or 'hybrid' (local, Azure when unsure)
+CAMERA_PRESENCE_DETECTOR = os.getenv("CAMERA_PRESENCE_DETECTOR", "azure")
+# Warm ffmpeg processes for speech clip conversion (apps/transcoding.py)
+TRANSCODER_POOL_SIZE = int(os.getenv("TRANSCODER_POOL_SIZE", "4"))
+TRANSCODER_MAX_WAITING = int(os.getenv("TRANSCODER_MAX_WAITING", "16"))
+TRANSCODER_ACQUIRE_TIMEOUT = float(os.getenv("TRANSCODER_ACQUIRE_TIMEOUT", "5"))
 
 # ==============================================================================
 